@@ -1,14 +1,63 @@
-from flask import Flask, render_template_string, request, jsonify, session
-from utils.rag import get_response
+from flask import Flask, Response, render_template_string, request, jsonify, session
+from utils import metrics
+import json
 import secrets
 import os
-from pathlib import Path
+import threading
+import time
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
 
-# Ensure database directory exists
-Path("database").mkdir(exist_ok=True)
+# Run the warm-up below when the app starts; "0" defers everything to first use
+WARMUP = os.environ.get("SOULSPACE_WARMUP", "1") != "0"
+
+def rag():
+    """The RAG stack, imported on first use so the app starts without it."""
+    from utils import rag
+    return rag
+
+class WarmUp:
+    """Background warm-up: import the RAG stack, open Chroma, run one
+    embedding and load the chat model, timing each stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self.ready = False
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.running:
+                self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        steps = [
+            ("import", rag),
+            ("components", lambda: rag().components.check()),
+            ("model", lambda: rag().preload_model()),
+        ]
+        try:
+            for stage, step in steps:
+                start = time.perf_counter()
+                step()
+                self.stages[stage] = round(time.perf_counter() - start, 3)
+            self.error = None
+            self.ready = True
+        except Exception as e:
+            self.error = str(e)
+            print(f"Warm-up failed, components will be built on first request: {str(e)}")
+
+warm_up = WarmUp()
+if WARMUP:
+    warm_up.start()
 
 HTML = """
 <!DOCTYPE html>
@@ -62,6 +111,12 @@ HTML = """
             line-height: 1.4;
             animation: fadeIn 0.3s ease-in;
         }
+        .message-row {
+            display: flow-root;
+        }
+        .message-text {
+            white-space: pre-wrap;
+        }
         @keyframes fadeIn {
             from { opacity: 0; transform: translateY(10px); }
             to { opacity: 1; transform: translateY(0); }
@@ -195,111 +250,347 @@ HTML = """
     </div>
 
     <script>
+        // Message persistence: one IndexedDB record per message, stored as plain text
+        class ChatStore {
+            open() {
+                return new Promise((resolve, reject) => {
+                    const request = indexedDB.open('soulspace', 1);
+                    request.onupgradeneeded = () => {
+                        const db = request.result;
+                        db.createObjectStore('sessions', { keyPath: 'id' });
+                        const messages = db.createObjectStore('messages', { keyPath: 'seq', autoIncrement: true });
+                        messages.createIndex('bySession', ['sessionId', 'seq']);
+                    };
+                    request.onsuccess = () => {
+                        this.db = request.result;
+                        resolve(this);
+                    };
+                    request.onerror = () => reject(request.error);
+                });
+            }
+
+            transaction(stores, mode, work) {
+                return new Promise((resolve, reject) => {
+                    const tx = this.db.transaction(stores, mode);
+                    let result;
+                    tx.oncomplete = () => resolve(result);
+                    tx.onerror = () => reject(tx.error);
+                    tx.onabort = () => reject(tx.error);
+                    work(tx, value => { result = value; });
+                });
+            }
+
+            sessions() {
+                return this.transaction('sessions', 'readonly', (tx, done) => {
+                    const request = tx.objectStore('sessions').getAll();
+                    request.onsuccess = () => done(request.result);
+                });
+            }
+
+            putSession(session) {
+                return this.transaction('sessions', 'readwrite', tx => {
+                    tx.objectStore('sessions').put(session);
+                });
+            }
+
+            addMessage(record) {
+                return this.transaction('messages', 'readwrite', (tx, done) => {
+                    const request = tx.objectStore('messages').add(record);
+                    request.onsuccess = () => done(request.result);
+                });
+            }
+
+            // Up to `limit` messages older than `beforeSeq`, oldest first
+            page(sessionId, beforeSeq, limit) {
+                const range = IDBKeyRange.bound([sessionId, -Infinity], [sessionId, beforeSeq], false, true);
+                return this.transaction('messages', 'readonly', (tx, done) => {
+                    const records = [];
+                    const request = tx.objectStore('messages').index('bySession').openCursor(range, 'prev');
+                    request.onsuccess = () => {
+                        const cursor = request.result;
+                        if (cursor && records.length < limit) {
+                            records.push(cursor.value);
+                            cursor.continue();
+                        } else {
+                            done(records.reverse());
+                        }
+                    };
+                });
+            }
+
+            clear() {
+                return this.transaction(['sessions', 'messages'], 'readwrite', tx => {
+                    tx.objectStore('sessions').clear();
+                    tx.objectStore('messages').clear();
+                });
+            }
+
+            // One-time move of the old single-blob localStorage history
+            async importLegacy() {
+                const legacy = JSON.parse(localStorage.getItem('soulspaceSessions') || 'null');
+                if (!legacy) return;
+                const parser = new DOMParser();
+                for (const session of Object.values(legacy)) {
+                    await this.putSession({ id: session.id, title: session.title, createdAt: session.createdAt, titled: true });
+                    for (const msg of session.messages || []) {
+                        const doc = parser.parseFromString(msg.html, 'text/html');
+                        doc.querySelectorAll('strong, .timestamp').forEach(el => el.remove());
+                        await this.addMessage({
+                            sessionId: session.id,
+                            text: doc.body.textContent.trim(),
+                            isUser: msg.isUser,
+                            time: ''
+                        });
+                    }
+                }
+                localStorage.removeItem('soulspaceSessions');
+            }
+        }
+
+        // Windowed chat view: only messages in or near the viewport are in the DOM
+        class ChatView {
+            constructor(container, onNearTop) {
+                this.container = container;
+                this.onNearTop = onNearTop;
+                this.messages = [];
+                this.nodes = new WeakMap();
+                this.heights = new WeakMap();
+                this.estimate = 64;
+                this.overscan = 800;
+                this.scheduled = false;
+
+                this.topSpacer = document.createElement('div');
+                this.list = document.createElement('div');
+                this.bottomSpacer = document.createElement('div');
+                container.replaceChildren(this.topSpacer, this.list, this.bottomSpacer);
+
+                container.addEventListener('scroll', () => this.schedule());
+                window.addEventListener('resize', () => this.schedule());
+            }
+
+            heightOf(msg) {
+                return this.heights.get(msg) || this.estimate;
+            }
+
+            nearBottom() {
+                const c = this.container;
+                return c.scrollHeight - c.scrollTop - c.clientHeight < 80;
+            }
+
+            node(msg) {
+                let row = this.nodes.get(msg);
+                if (!row) {
+                    row = document.createElement('div');
+                    row.className = 'message-row';
+                    const div = document.createElement('div');
+                    div.className = `message ${msg.isUser ? 'user-message' : 'bot-message'}`;
+                    if (msg.animation) div.style.animation = msg.animation;
+
+                    if (msg.kind === 'countdown') {
+                        div.innerHTML = '<div class="countdown"></div>';
+                    } else {
+                        const label = document.createElement('strong');
+                        label.textContent = `${msg.isUser ? 'You' : 'Therapist'}: `;
+                        const text = document.createElement(msg.kind === 'instruction' ? 'div' : 'span');
+                        text.className = msg.kind === 'instruction' ? 'breathing-instruction message-text' : 'message-text';
+                        const timestamp = document.createElement('div');
+                        timestamp.className = 'timestamp';
+                        timestamp.textContent = msg.time || '';
+                        div.append(label, text, timestamp);
+                    }
+                    row.appendChild(div);
+                    this.nodes.set(msg, row);
+                }
+                row.querySelector(msg.kind === 'countdown' ? '.countdown' : '.message-text').textContent = msg.text;
+                return row;
+            }
+
+            schedule() {
+                if (this.scheduled) return;
+                this.scheduled = true;
+                requestAnimationFrame(() => {
+                    this.scheduled = false;
+                    this.render();
+                    if (this.container.scrollTop < 200) this.onNearTop();
+                });
+            }
+
+            render() {
+                const top = this.container.scrollTop - this.overscan;
+                const bottom = this.container.scrollTop + this.container.clientHeight + this.overscan;
+                let first = 0;
+                let offset = 0;
+                while (first < this.messages.length && offset + this.heightOf(this.messages[first]) < top) {
+                    offset += this.heightOf(this.messages[first++]);
+                }
+                const topHeight = offset;
+                let last = first;
+                while (last < this.messages.length && offset < bottom) {
+                    offset += this.heightOf(this.messages[last++]);
+                }
+                let bottomHeight = 0;
+                for (let i = last; i < this.messages.length; i++) bottomHeight += this.heightOf(this.messages[i]);
+
+                // Move only rows that enter or leave the window
+                const wanted = this.messages.slice(first, last).map(msg => this.node(msg));
+                const keep = new Set(wanted);
+                for (const child of [...this.list.children]) {
+                    if (!keep.has(child)) child.remove();
+                }
+                let cursor = this.list.firstChild;
+                for (const row of wanted) {
+                    if (row === cursor) cursor = cursor.nextSibling;
+                    else this.list.insertBefore(row, cursor);
+                }
+
+                this.topSpacer.style.height = `${topHeight}px`;
+                this.bottomSpacer.style.height = `${bottomHeight}px`;
+                this.messages.slice(first, last).forEach((msg, i) => this.heights.set(msg, wanted[i].offsetHeight));
+            }
+
+            scrollToBottom() {
+                this.container.scrollTop = this.container.scrollHeight;
+                this.render();
+                this.container.scrollTop = this.container.scrollHeight;
+            }
+
+            reset(messages) {
+                this.messages = messages;
+                this.list.replaceChildren();
+                this.scrollToBottom();
+                this.schedule();
+            }
+
+            append(msg) {
+                const stick = this.nearBottom();
+                this.messages.push(msg);
+                this.render();
+                if (stick) this.scrollToBottom();
+            }
+
+            prepend(older) {
+                if (!older.length) return;
+                const previousHeight = this.container.scrollHeight;
+                this.messages.unshift(...older);
+                this.render();
+                // Keep the messages the reader is looking at in place
+                this.container.scrollTop += this.container.scrollHeight - previousHeight;
+                this.render();
+            }
+
+            update(msg) {
+                const stick = this.nearBottom();
+                const row = this.nodes.get(msg);
+                if (row && row.isConnected) {
+                    this.node(msg);
+                    this.heights.set(msg, row.offsetHeight);
+                }
+                if (stick) this.scrollToBottom();
+            }
+        }
+
         // Chat Manager Class
         class ChatManager {
             constructor() {
                 this.currentSessionId = null;
-                this.sessions = JSON.parse(localStorage.getItem('soulspaceSessions')) || {};
-                
+                this.sessions = {};
+                this.store = new ChatStore();
+                this.pageSize = 30;
+                this.loadingOlder = false;
+                this.view = new ChatView(document.getElementById('chat'), () => this.loadOlder());
+                this.ready = this.init();
+            }
+
+            async init() {
+                await this.store.open();
+                await this.store.importLegacy();
+
                 // Clear history if requested via URL
                 if (new URLSearchParams(window.location.search).has('reset')) {
-                    this.clearAllHistory();
+                    await this.store.clear();
                     window.history.replaceState({}, document.title, window.location.pathname);
                 }
-                
-                this.init();
-            }
-            
-            init() {
+
+                for (const session of await this.store.sessions()) {
+                    this.sessions[session.id] = session;
+                }
                 if (Object.keys(this.sessions).length === 0) {
                     this.createNewSession();
                 } else {
                     // Load most recent session
-                    const sessions = Object.values(this.sessions).sort((a, b) => 
+                    const sessions = Object.values(this.sessions).sort((a, b) =>
                         new Date(b.createdAt) - new Date(a.createdAt));
-                    this.currentSessionId = sessions[0].id;
-                    this.loadSession(this.currentSessionId);
+                    this.renderSessionsList();
+                    await this.loadSession(sessions[0].id);
                 }
             }
-            
+
             createNewSession() {
-                // Clear chat display immediately
-                document.getElementById('chat').innerHTML = '';
-                
                 // Create new session ID
                 const sessionId = 'session-' + Date.now();
                 this.currentSessionId = sessionId;
-                
-                // Create fresh session object
+                this.oldestSeq = Infinity;
+                this.hasOlder = false;
+                this.view.reset([]);
+
+                // Create fresh session record
                 this.sessions[sessionId] = {
                     id: sessionId,
                     title: 'Session ' + (Object.keys(this.sessions).length + 1),
-                    messages: [],
-                    createdAt: new Date().toISOString()
+                    createdAt: new Date().toISOString(),
+                    titled: false
                 };
-                
-                // Save and update UI
-                this.saveSessions();
+                this.store.putSession(this.sessions[sessionId]);
                 this.renderSessionsList();
-                
+
                 // Clear server-side memory
-                fetch('/new_session', { 
+                fetch('/new_session', {
                     method: 'POST'
                 }).catch(err => console.error('Error clearing server memory:', err));
-                
+
                 // Add welcome message
                 this.addMessage("Welcome to a new session. How can I help you today?", false);
-                
+
                 return sessionId;
             }
-            
-            clearAllHistory() {
-                localStorage.removeItem('soulspaceSessions');
+
+            async clearAllHistory() {
+                await this.store.clear();
                 this.sessions = {};
                 this.createNewSession();
             }
-            
-            saveCurrentSession() {
-                if (this.currentSessionId && this.sessions[this.currentSessionId]) {
-                    const chatDiv = document.getElementById('chat');
-                    this.sessions[this.currentSessionId].messages = Array.from(chatDiv.children)
-                        .map(el => ({
-                            html: el.innerHTML,
-                            isUser: el.classList.contains('user-message')
-                        }));
-                    this.saveSessions();
-                }
-            }
-            
-            loadSession(sessionId) {
-                // Save current session before switching
-                this.saveCurrentSession();
-                
-                // Set new session ID
+
+            async loadSession(sessionId) {
                 this.currentSessionId = sessionId;
-                const chatDiv = document.getElementById('chat');
-                chatDiv.innerHTML = '';
-                
-                // Load messages for this session
-                const session = this.sessions[sessionId];
-                if (session && session.messages) {
-                    session.messages.forEach(msg => {
-                        const div = document.createElement('div');
-                        div.className = `message ${msg.isUser ? 'user-message' : 'bot-message'}`;
-                        div.innerHTML = msg.html;
-                        chatDiv.appendChild(div);
-                    });
-                }
-                
-                // Scroll to bottom and update UI
-                chatDiv.scrollTop = chatDiv.scrollHeight;
                 this.updateActiveSession();
+
+                // Only the newest page is read; older pages load while scrolling up
+                const records = await this.store.page(sessionId, Infinity, this.pageSize);
+                if (this.currentSessionId !== sessionId) return;
+                this.oldestSeq = records.length ? records[0].seq : Infinity;
+                this.hasOlder = records.length === this.pageSize;
+                this.view.reset(records);
             }
-            
+
+            async loadOlder() {
+                if (this.loadingOlder || !this.hasOlder) return;
+                this.loadingOlder = true;
+                const sessionId = this.currentSessionId;
+                try {
+                    const records = await this.store.page(sessionId, this.oldestSeq, this.pageSize);
+                    if (this.currentSessionId !== sessionId) return;
+                    if (records.length) this.oldestSeq = records[0].seq;
+                    this.hasOlder = records.length === this.pageSize;
+                    this.view.prepend(records);
+                } finally {
+                    this.loadingOlder = false;
+                }
+            }
+
             renderSessionsList() {
                 const listDiv = document.getElementById('sessions-list');
                 listDiv.innerHTML = '';
-                
+
                 // Sort sessions by date (newest first)
                 Object.values(this.sessions)
                     .sort((a, b) => new Date(b.createdAt) - new Date(a.createdAt))
@@ -311,49 +602,72 @@ HTML = """
                         item.addEventListener('click', () => this.loadSession(session.id));
                         listDiv.appendChild(item);
                     });
-                
+
                 this.updateActiveSession();
             }
-            
+
             updateActiveSession() {
                 document.querySelectorAll('.session-item').forEach(item => {
                     item.classList.toggle('active', item.dataset.sessionId === this.currentSessionId);
                 });
             }
-            
-            saveSessions() {
-                localStorage.setItem('soulspaceSessions', JSON.stringify(this.sessions));
-            }
-            
-            addMessage(content, isUser) {
-                const chatDiv = document.getElementById('chat');
-                const messageDiv = document.createElement('div');
-                messageDiv.className = `message ${isUser ? 'user-message' : 'bot-message'}`;
-                
-                const timestamp = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
-                messageDiv.innerHTML = `
-                    <strong>${isUser ? 'You' : 'Therapist'}:</strong> ${content}
-                    <div class="timestamp">${timestamp}</div>
-                `;
-                
-                chatDiv.appendChild(messageDiv);
-                chatDiv.scrollTop = chatDiv.scrollHeight;
-                
-                // Update session title if first user message
-                if (isUser && this.sessions[this.currentSessionId].messages.length === 0) {
-                    this.sessions[this.currentSessionId].title = 
-                        content.length > 25 ? content.substring(0, 25) + '...' : content;
+
+            persist(msg) {
+                const { sessionId, text, isUser, time, kind } = msg;
+                this.store.addMessage({ sessionId, text, isUser, time, kind })
+                    .then(seq => { msg.seq = seq; })
+                    .catch(err => console.error('Error saving message:', err));
+            }
+
+            addMessage(text, isUser, kind) {
+                const msg = {
+                    sessionId: this.currentSessionId,
+                    text,
+                    isUser,
+                    kind,
+                    time: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
+                };
+                this.view.append(msg);
+
+                // Update session title on first user message
+                const session = this.sessions[this.currentSessionId];
+                if (isUser && !session.titled) {
+                    session.title = text.length > 25 ? text.substring(0, 25) + '...' : text;
+                    session.titled = true;
+                    this.store.putSession(session);
                     this.renderSessionsList();
                 }
-                
-                // Save message to session
-                this.sessions[this.currentSessionId].messages.push({
-                    html: messageDiv.innerHTML,
-                    isUser
-                });
-                this.saveSessions();
-                
-                return messageDiv;
+
+                this.persist(msg);
+                return msg;
+            }
+
+            // Shown but never stored, e.g. breathing countdowns
+            addTransient(text, kind, animation) {
+                const msg = { text, isUser: false, kind, animation };
+                this.view.append(msg);
+                return msg;
+            }
+
+            updateMessage(msg, text) {
+                msg.text = text;
+                this.view.update(msg);
+            }
+
+            beginStreamingMessage() {
+                // Bot message whose text grows as tokens arrive; stored once complete
+                const msg = {
+                    sessionId: this.currentSessionId,
+                    text: '',
+                    isUser: false,
+                    time: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
+                };
+                this.view.append(msg);
+
+                return {
+                    append: (token) => this.updateMessage(msg, msg.text + token),
+                    finish: () => this.persist(msg)
+                };
             }
         }
 
@@ -361,13 +675,15 @@ HTML = """
         const chatManager = new ChatManager();
 
         // Event Listeners
-        document.getElementById('newSessionBtn').addEventListener('click', () => {
+        document.getElementById('newSessionBtn').addEventListener('click', async () => {
+            await chatManager.ready;
             if (confirm('Start a fresh session? Your current chat will be saved.')) {
                 chatManager.createNewSession();
             }
         });
 
-        document.getElementById('clearHistoryBtn').addEventListener('click', () => {
+        document.getElementById('clearHistoryBtn').addEventListener('click', async () => {
+            await chatManager.ready;
             if (confirm('Permanently delete ALL chat history?')) {
                 chatManager.clearAllHistory();
             }
@@ -377,24 +693,60 @@ HTML = """
             if (e.key === 'Enter') {
                 const userMessage = e.target.value.trim();
                 if (!userMessage) return;
-                
+
+                await chatManager.ready;
                 e.target.value = '';
                 chatManager.addMessage(userMessage, true);
-                
-                // Show typing indicator
-                document.getElementById('typing-indicator').style.display = 'block';
-                
+
+                // Show typing indicator until the first token arrives
+                const typingIndicator = document.getElementById('typing-indicator');
+                typingIndicator.style.display = 'block';
+                let reply = null;
+
                 try {
-                    const response = await fetch('/chat', {
+                    const response = await fetch('/chat/stream', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify({ message: userMessage })
-                    }).then(res => res.json());
-                    
-                    document.getElementById('typing-indicator').style.display = 'none';
-                    chatManager.addMessage(response.response, false);
+                    });
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+
+                    while (true) {
+                        const { done, value } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+
+                        // Server-Sent Events are separated by a blank line
+                        let boundary;
+                        while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                            const frame = buffer.slice(0, boundary);
+                            buffer = buffer.slice(boundary + 2);
+                            const data = frame.split('\\n')
+                                .filter(line => line.startsWith('data:'))
+                                .map(line => line.slice(5).trim())
+                                .join('');
+                            if (!data) continue;
+
+                            const event = JSON.parse(data);
+                            if (event.token) {
+                                if (!reply) {
+                                    typingIndicator.style.display = 'none';
+                                    reply = chatManager.beginStreamingMessage();
+                                }
+                                reply.append(event.token);
+                            }
+                        }
+                    }
+
+                    typingIndicator.style.display = 'none';
+                    if (reply) reply.finish();
                 } catch (error) {
-                    document.getElementById('typing-indicator').style.display = 'none';
+                    typingIndicator.style.display = 'none';
+                    if (reply) reply.finish();
                     chatManager.addMessage("I'm having trouble connecting. Please try again.", false);
                     console.error('Error:', error);
                 }
@@ -402,7 +754,8 @@ HTML = """
         });
 
         // Enhanced Breathing Exercise
-        document.getElementById('breathingBtn').addEventListener('click', () => {
+        document.getElementById('breathingBtn').addEventListener('click', async () => {
+            await chatManager.ready;
             const steps = [
                 {text: " Let's begin the 4-7-8 breathing exercise", duration: 1},
                 {text: " First, empty your lungs completely", duration: 1},
@@ -414,35 +767,31 @@ HTML = """
                 {text: " Hold for 7 seconds", duration: 7},
                 {text: " Exhale for 8 seconds", duration: 8}
             ];
-            
+
             let currentStep = 0;
-            
+
             function runStep() {
                 if (currentStep >= steps.length) {
                     chatManager.addMessage(" Great job completing the breathing exercise! How do you feel now?", false);
                     return;
                 }
-                
+
                 const step = steps[currentStep];
-                const messageDiv = chatManager.addMessage(`<div class="breathing-instruction">${step.text}</div>`, false);
-                
-                // Create enhanced countdown
-                const countdownDiv = document.createElement('div');
-                countdownDiv.className = 'bot-message message';
-                countdownDiv.innerHTML = `<div class="countdown">${step.duration}</div>`;
-                document.getElementById('chat').appendChild(countdownDiv);
-                
-                // Add breathing animation effect
+                chatManager.addMessage(step.text, false, 'instruction');
+
+                // Create enhanced countdown with breathing animation effect
+                let animation;
                 if (step.text.includes("Breathe in")) {
-                    countdownDiv.style.animation = "pulseIn 1s infinite";
+                    animation = "pulseIn 1s infinite";
                 } else if (step.text.includes("Exhale")) {
-                    countdownDiv.style.animation = "pulseOut 1s infinite";
+                    animation = "pulseOut 1s infinite";
                 }
-                
+                const countdownMsg = chatManager.addTransient(String(step.duration), 'countdown', animation);
+
                 let remaining = step.duration;
                 const countdown = setInterval(() => {
                     remaining--;
-                    countdownDiv.querySelector('.countdown').textContent = remaining;
+                    chatManager.updateMessage(countdownMsg, String(remaining));
                     if (remaining <= 0) {
                         clearInterval(countdown);
                         currentStep++;
@@ -450,7 +799,7 @@ HTML = """
                     }
                 }, 1000);
             }
-            
+
             runStep();
         });
 
@@ -478,17 +827,64 @@ HTML = """
 def home():
     return render_template_string(HTML)
 
+def session_id():
+    if 'id' not in session:
+        session['id'] = secrets.token_hex(16)
+    return session['id']
+
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.json
-    response = get_response(data['message'])
+    response = rag().get_response(data['message'], session_id())
     return jsonify({"response": response})
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    sid = session_id()
+    stream_response = rag().stream_response
+
+    def events():
+        for token in stream_response(data['message'], sid):
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/new_session', methods=['POST'])
 def new_session():
-    from utils.rag import memory
-    memory.clear()  
+    rag().memory_store.clear(session_id())
     return jsonify({"success": True})
 
+@app.route('/history')
+def history():
+    # Newest page first; pass next_before back as ?before= for older messages
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    return jsonify(rag().memory_store.page(session_id(), before=before, limit=limit))
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and serving, whatever the state of Ollama
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: warm-up has finished; a failed or skipped warm-up is (re)started by the probe
+    if not warm_up.ready:
+        warm_up.start()
+    return jsonify({
+        "ready": warm_up.ready,
+        "stages": warm_up.stages,
+        "error": warm_up.error
+    }), 200 if warm_up.ready else 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""Asyncio serving mode for SoulSpace.
+
+    uvicorn asgi:app --port 5000
+
+/chat and /chat/stream run on the event loop and talk to Ollama through the
+async side of the shared host router. Generations are admitted by the same
+fair scheduler as the Flask app (rag.scheduler); once its queue is full,
+requests are refused with 429 and a Retry-After header. Every chat request has a deadline of
+REQUEST_DEADLINE seconds; with rag.LATENCY_BUDGET set, a model that misses
+the budget is cut off and a degraded answer built from the retrieved
+techniques is sent instead. All other routes are served by the Flask app.
+"""
+import asyncio
+import json
+import secrets
+import time
+from contextlib import nullcontext
+from http.cookies import SimpleCookie
+
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+from app import app as flask_app
+from utils import metrics, rag
+from utils.response_handler import make_empathic, empathic_prefix
+from utils.scheduler import QueueFull
+
+# Configuration
+REQUEST_DEADLINE = 60  # seconds
+RETRY_AFTER = 2  # seconds
+
+
+def generation_slot(session_id, priority):
+    if rag.scheduler is None:
+        return nullcontext()
+    return rag.scheduler.slot_async(session_id, priority)
+
+
+def overloaded():
+    """Refuse up front when the scheduler's queue is already full."""
+    if rag.scheduler is None or not rag.scheduler.full():
+        return False
+    rag.scheduler.rejected += 1
+    return True
+
+
+def budget_deadline():
+    """Event-loop time by which the model must answer, or None without a budget."""
+    if rag.LATENCY_BUDGET is None:
+        return None
+    return asyncio.get_running_loop().time() + rag.LATENCY_BUDGET
+
+
+async def prepare_messages(message, session_id):
+    context, messages, history_str = await asyncio.to_thread(rag.prepare, message, session_id)
+    return context, messages, rag.priority_for(history_str)
+
+
+async def generate(message, session_id):
+    deadline = budget_deadline()
+    context, messages, priority = await prepare_messages(message, session_id)
+    try:
+        # Waiting for a scheduler slot counts against the budget too
+        async with asyncio.timeout_at(deadline):
+            async with generation_slot(session_id, priority):
+                with metrics.span("generation"):
+                    response = await rag.components.client.achat(
+                        model=rag.MODEL,
+                        messages=messages,
+                        options={"temperature": rag.TEMPERATURE},
+                        keep_alive=rag.KEEP_ALIVE,
+                        session_id=session_id
+                    )
+        rag.record_generation(response)
+        content = response['message']['content']
+    except TimeoutError:
+        metrics.budget_overruns.inc(stage="generation")
+        content = rag.degraded_answer(context)
+    await asyncio.to_thread(rag.save_turn, session_id, message, content)
+    return content
+
+
+async def generate_stream(message, session_id):
+    deadline = budget_deadline()
+    context, messages, priority = await prepare_messages(message, session_id)
+    parts = []
+    stream = None
+    try:
+        # Only the first token has a deadline; a started reply runs on
+        async with asyncio.timeout_at(deadline) as budget:
+            async with generation_slot(session_id, priority):
+                started = time.perf_counter()
+                ttft = None
+                stream = await rag.components.client.achat(
+                    model=rag.MODEL,
+                    messages=messages,
+                    options={"temperature": rag.TEMPERATURE},
+                    keep_alive=rag.KEEP_ALIVE,
+                    stream=True,
+                    session_id=session_id
+                )
+                with metrics.span("generation"):
+                    async for chunk in stream:
+                        token = chunk['message']['content']
+                        if token:
+                            if ttft is None:
+                                ttft = time.perf_counter() - started
+                                budget.reschedule(None)
+                            parts.append(token)
+                            yield token
+                        if chunk.get('done'):
+                            rag.record_generation(chunk, ttft)
+    except TimeoutError:
+        if parts:
+            raise
+        metrics.budget_overruns.inc(stage="first_token")
+        parts.append(rag.degraded_answer(context))
+        yield parts[0]
+    finally:
+        if stream is not None:
+            await stream.aclose()
+    await asyncio.to_thread(rag.save_turn, session_id, message, "".join(parts))
+
+
+# ASGI plumbing
+
+def session_from(scope):
+    """Read the Flask session cookie so both apps agree on the session id."""
+    cookies = SimpleCookie()
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    cookie_name = flask_app.config["SESSION_COOKIE_NAME"]
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if cookie_name in cookies:
+        try:
+            data = serializer.loads(cookies[cookie_name].value)
+            if "id" in data:
+                return data["id"], None
+        except Exception:
+            pass
+    session_id = secrets.token_hex(16)
+    cookie = f"{cookie_name}={serializer.dumps({'id': session_id})}; HttpOnly; Path=/; SameSite=Lax"
+    return session_id, cookie
+
+
+async def read_json(receive):
+    body = b""
+    while True:
+        event = await receive()
+        body += event.get("body", b"")
+        if not event.get("more_body"):
+            return json.loads(body or b"{}")
+
+
+async def start(send, status, content_type, cookie=None, extra=()):
+    headers = [(b"content-type", content_type.encode())]
+    if cookie:
+        headers.append((b"set-cookie", cookie.encode()))
+    headers.extend((name.encode(), value.encode()) for name, value in extra)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+
+
+async def send_json(send, status, payload, cookie=None, extra=()):
+    await start(send, status, "application/json", cookie, extra)
+    await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+
+async def too_busy(send, cookie):
+    await send_json(send, 429, {"error": "busy"}, cookie,
+                    [("retry-after", str(RETRY_AFTER))])
+
+
+async def chat(scope, receive, send):
+    data = await read_json(receive)
+    session_id, cookie = session_from(scope)
+    if overloaded():
+        return await too_busy(send, cookie)
+
+    status = 200
+    with metrics.traced("asgi_chat"):
+        try:
+            async with asyncio.timeout(REQUEST_DEADLINE):
+                content = await generate(data['message'], session_id)
+        except QueueFull:
+            return await too_busy(send, cookie)
+        except TimeoutError:
+            status, content = 504, rag.fallback("deadline")
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            content = rag.fallback("error")
+    await send_json(send, status, {"response": make_empathic(content)}, cookie)
+
+
+async def chat_stream(scope, receive, send):
+    data = await read_json(receive)
+    session_id, cookie = session_from(scope)
+    if overloaded():
+        return await too_busy(send, cookie)
+
+    async def event(payload, name=None):
+        frame = f"data: {json.dumps(payload)}\n\n"
+        if name:
+            frame = f"event: {name}\n{frame}"
+        await send({"type": "http.response.body", "body": frame.encode(), "more_body": True})
+
+    await start(send, 200, "text/event-stream", cookie,
+                [("cache-control", "no-cache"), ("x-accel-buffering", "no")])
+    await event({"token": empathic_prefix()})
+    sent = False
+    with metrics.traced("asgi_stream"):
+        try:
+            async with asyncio.timeout(REQUEST_DEADLINE):
+                async for token in generate_stream(data['message'], session_id):
+                    sent = True
+                    await event({"token": token})
+        except Exception as e:
+            print(f"Error: {str(e) or type(e).__name__}")
+            if not sent:
+                reason = "deadline" if isinstance(e, TimeoutError) else "error"
+                await event({"token": rag.fallback(reason)})
+    await event({}, "done")
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def metrics_endpoint(scope, receive, send):
+    await start(send, 200, "text/plain; version=0.0.4")
+    await send({"type": "http.response.body", "body": metrics.registry.render().encode()})
+
+
+ROUTES = {
+    ("GET", "/metrics"): metrics_endpoint,
+    ("POST", "/chat"): chat,
+    ("POST", "/chat/stream"): chat_stream,
+}
+
+flask_asgi = WSGIMiddleware(flask_app)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http":
+        handler = ROUTES.get((scope["method"], scope["path"]))
+        if handler is not None:
+            return await handler(scope, receive, send)
+    return await flask_asgi(scope, receive, send)
@@ -0,0 +1,225 @@
+"""End-to-end /chat latency against a stand-in Ollama server.
+
+Starts benchmarks/fake_ollama.py in-process, points the app at it and at a
+throwaway database, loads a synthetic knowledge base, then drives /chat (or
+/chat/stream) through Flask's test client from concurrent simulated users.
+Reports p50/p95/p99 latency, throughput and a per-stage breakdown, and
+writes everything to a JSON file. Pass --compare with an earlier result to
+see the change per metric.
+
+    python benchmarks/bench_chat.py --users 8 --requests 200 --output bench_chat.json
+    python benchmarks/bench_chat.py --compare bench_chat.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.fake_ollama import FakeOllama
+
+MESSAGES = [
+    "I feel anxious about work",
+    "I can't sleep at night",
+    "My chest gets tight when I'm stressed",
+    "How do I stop overthinking?",
+    "I had a panic attack yesterday",
+    "I feel lonely since I moved",
+]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+    }
+
+
+class StageTimer:
+    """Wraps functions so every call records its duration under a stage name."""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, start):
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return self._drain(name, start, result) if kwargs.get("stream") else result
+            finally:
+                if not kwargs.get("stream"):
+                    self.record(name, start)
+        return timed
+
+    def _drain(self, name, start, stream):
+        # A streamed call is timed until its last chunk has been read
+        try:
+            yield from stream
+        finally:
+            self.record(name, start)
+
+
+def synthetic_corpus(size):
+    from utils.ingest import content_hash
+    topics = ["anxiety", "sleep", "stress", "grief", "anger", "loneliness", "panic", "worry"]
+    tips = ["slow breathing", "grounding", "journaling", "a short walk", "muscle relaxation",
+            "reframing the thought", "calling a friend", "a body scan"]
+    texts = []
+    for i in range(size):
+        topic, tip = topics[i % len(topics)], tips[(i // len(topics)) % len(tips)]
+        texts.append(f"For {topic}, try {tip}. Note {i}: notice the feeling, name it, "
+                     f"and give yourself a few minutes before reacting.")
+    return [(f"bench_{i}", text, {"source": "bench", "content_hash": content_hash(text), "chunk": 0})
+            for i, text in enumerate(texts)]
+
+
+def run_user(app, endpoint, count, offset, latencies, first_bytes):
+    client = app.test_client()
+    for i in range(count):
+        message = MESSAGES[(offset + i) % len(MESSAGES)]
+        start = time.perf_counter()
+        if endpoint == "stream":
+            response = client.post("/chat/stream", json={"message": message}, buffered=False)
+            first = None
+            for _ in response.response:
+                if first is None:
+                    first = time.perf_counter()
+            first_bytes.append((first - start) * 1000)
+            response.close()
+        else:
+            client.post("/chat", json={"message": message}).get_json()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def compare(current, previous):
+    print(f"\nChange versus {previous['started_at']}:")
+    rows = [("latency", current["latency"], previous["latency"])]
+    rows += [(f"stage {name}", stats, previous["stages"].get(name))
+             for name, stats in current["stages"].items()]
+    for label, now, before in rows:
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[key]:
+                change = (now[key] - before[key]) / before[key]
+                print(f"  {label:<24} {key:<7} {before[key]:9.2f} -> {now[key]:9.2f} ({change:+.1%})")
+    before, now = previous["throughput_rps"], current["throughput_rps"]
+    print(f"  {'throughput':<24} {'rps':<7} {before:9.2f} -> {now:9.2f} ({(now - before) / before:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=200, help="total chat requests")
+    parser.add_argument("--endpoint", choices=["chat", "stream"], default="chat")
+    parser.add_argument("--corpus", type=int, default=500, help="knowledge-base documents")
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--latency-budget", type=float, help="seconds before a degraded answer (rag.LATENCY_BUDGET)")
+    parser.add_argument("--sequential", action="store_true",
+                        help="retrieve, then load history (rag.CONTEXT_THREADS = None)")
+    parser.add_argument("--score-threshold", type=float, help="rag.RETRIEVAL_SCORE_THRESHOLD")
+    parser.add_argument("--output", default="bench_chat.json")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    fake = FakeOllama(embed_latency=args.embed_latency, chat_latency=args.chat_latency,
+                      tokens_per_second=args.tokens_per_second).start()
+    database = tempfile.mkdtemp(prefix="soulspace-bench-")
+    os.environ["OLLAMA_HOST"] = fake.url
+    os.environ["SOULSPACE_DATABASE"] = database
+
+    import app as app_module
+    from utils import metrics, rag
+    from utils.ingest import ingest
+
+    ingest(synthetic_corpus(args.corpus), rag.components.vectorstore, rag.components.embeddings,
+           on_batch=rag.components.index_chunks)
+
+    rag.LATENCY_BUDGET = args.latency_budget
+    if args.sequential:
+        rag.context_pool = None
+    if args.score_threshold is not None:
+        rag.RETRIEVAL_SCORE_THRESHOLD = args.score_threshold
+    timer = StageTimer()
+    # Retrieval and history together, the part of the request before generation
+    rag.prepare = timer.wrap("prepare", rag.prepare)
+    rag.retrieve_context = timer.wrap("retrieval", rag.retrieve_context)
+    rag.load_history = timer.wrap("history", rag.load_history)
+    rag.load_history_messages = timer.wrap("history", rag.load_history_messages)
+    rag.make_empathic = timer.wrap("make_empathic", rag.make_empathic)
+    client = rag.components.client
+    client.chat = timer.wrap("generation", client.chat)
+
+    latencies, first_bytes = [], []
+    per_user, extra = divmod(args.requests, args.users)
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        users = [pool.submit(run_user, app_module.app, args.endpoint, per_user + (user < extra),
+                             user, latencies, first_bytes)
+                 for user in range(args.users)]
+        for user in users:
+            user.result()
+    elapsed = time.perf_counter() - start
+    fake.stop()
+
+    result = {
+        "started_at": started_at,
+        "python": platform.python_version(),
+        "config": vars(args),
+        "throughput_rps": len(latencies) / elapsed,
+        "latency": summarize(latencies),
+        "stages": {name: summarize(values) for name, values in sorted(timer.samples.items())},
+    }
+    if first_bytes:
+        result["time_to_first_byte"] = summarize(first_bytes)
+    degraded = metrics.fallback_responses.value(reason="deadline")
+    result["degraded_rate"] = degraded / len(latencies) if latencies else 0.0
+
+    print(f"{len(latencies)} requests from {args.users} users in {elapsed:.1f}s "
+          f"({result['throughput_rps']:.1f} req/s), {result['degraded_rate']:.1%} degraded")
+    rows = [("latency", result["latency"])]
+    if first_bytes:
+        rows.append(("time to first byte", result["time_to_first_byte"]))
+    rows += [(f"stage {name}", stats) for name, stats in result["stages"].items()]
+    for label, stats in rows:
+        print(f"  {label:<24} p50 {stats['p50_ms']:9.2f}  p95 {stats['p95_ms']:9.2f}  "
+              f"p99 {stats['p99_ms']:9.2f} ms")
+
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text()))
+    Path(args.output).write_text(json.dumps(result, indent=2))
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Per-request latency with per-call component construction vs. the shared pool.
+
+Times the part of get_response that the pool changes: building the Chroma
+store, embeddings and Ollama client, then running the k=3 retrieval. The
+Mistral call is identical in both modes and is left out. The pool's
+embedding cache and batching are turned off, so every pooled request embeds
+its query just as a per-call request does.
+
+    python benchmarks/bench_component_pool.py --requests 50
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain_chroma import Chroma
+from langchain_ollama import OllamaEmbeddings
+from ollama import Client
+
+from utils import rag
+
+QUERIES = ["I feel anxious", "I can't sleep", "breathing", "I'm stressed at work", "grounding"]
+
+
+def per_request(query):
+    db = Chroma(
+        collection_name=rag.COLLECTION_NAME,
+        embedding_function=OllamaEmbeddings(model=rag.EMBEDDING_MODEL, base_url=rag.OLLAMA_HOST),
+        persist_directory=rag.PERSIST_DIRECTORY
+    )
+    db.similarity_search(query, k=3)
+    Client(host=rag.OLLAMA_HOST)
+
+
+def pooled(query):
+    rag.components.vectorstore.similarity_search(query, k=3)
+    rag.components.client
+
+
+def measure(fn, requests):
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        fn(QUERIES[i % len(QUERIES)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} mean {statistics.mean(timings):8.2f} ms  "
+          f"p50 {statistics.median(timings):8.2f} ms  p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    rag.components.embedding_cache = None
+    rag.components.embedding_batch = None
+    rag.components.check()
+    report("per-request", measure(per_request, args.requests))
+    report("pooled", measure(pooled, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Prompt-eval tokens and time to first token per turn, by PROMPT_MODE.
+
+Holds one multi-turn conversation in each prompt mode against the stand-in
+Ollama server, which evaluates only the part of a prompt that is not a
+cached prefix, and prints what Ollama reported for every turn. Point
+OLLAMA_HOST at a real server with --real to measure actual KV-cache reuse.
+
+    python benchmarks/bench_prefix.py --turns 10
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_chat import MESSAGES, synthetic_corpus
+from benchmarks.fake_ollama import FakeOllama
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--corpus", type=int, default=200, help="knowledge-base documents")
+    parser.add_argument("--prefill-per-token", type=float, default=0.0005,
+                        help="stand-in server's seconds per evaluated prompt token")
+    parser.add_argument("--real", action="store_true", help="use OLLAMA_HOST instead of the stand-in")
+    args = parser.parse_args()
+
+    fake = None
+    if not args.real:
+        fake = FakeOllama(chat_latency=0.01, tokens_per_second=2000,
+                          prefill_per_token=args.prefill_per_token).start()
+        os.environ["OLLAMA_HOST"] = fake.url
+    trace_log = Path(tempfile.mkdtemp(prefix="soulspace-bench-")) / "trace.jsonl"
+    os.environ["SOULSPACE_TRACE_LOG"] = str(trace_log)
+    os.environ.setdefault("SOULSPACE_DATABASE", tempfile.mkdtemp(prefix="soulspace-bench-"))
+
+    from utils import rag
+    from utils.ingest import ingest
+
+    ingest(synthetic_corpus(args.corpus), rag.components.vectorstore, rag.components.embeddings,
+           on_batch=rag.components.index_chunks)
+
+    results = {}
+    for mode in ("single", "messages"):
+        rag.PROMPT_MODE = mode
+        start = len(trace_log.read_text().splitlines()) if trace_log.exists() else 0
+        for turn in range(args.turns):
+            rag.get_response(MESSAGES[turn % len(MESSAGES)], session_id=f"bench-{mode}")
+        if rag.HISTORY_MODE == "budget":
+            rag.history_window.join()
+        traces = [json.loads(line) for line in trace_log.read_text().splitlines()[start:]]
+        results[mode] = [(trace.get("prompt_eval_count", 0), trace.get("ttft_ms", 0.0)) for trace in traces]
+
+    print(f"{'turn':>4}  {'single: eval tokens':>20} {'ttft ms':>9}  {'messages: eval tokens':>22} {'ttft ms':>9}")
+    for turn, (single, messages) in enumerate(zip(results["single"], results["messages"]), 1):
+        print(f"{turn:>4}  {single[0]:>20} {single[1]:>9.1f}  {messages[0]:>22} {messages[1]:>9.1f}")
+    totals = {mode: sum(count for count, _ in rows) for mode, rows in results.items()}
+    if totals["single"]:
+        print(f"\nPrompt tokens evaluated: {totals['single']} single, {totals['messages']} messages "
+              f"({(totals['messages'] - totals['single']) / totals['single']:+.1%})")
+
+    if fake is not None:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Throughput of the pre-fork server (serve.py) by worker count.
+
+Loads a synthetic knowledge base into a throwaway database, starts the
+stand-in Ollama server in its own process with no model latency, so the
+non-LLM stages (retrieval, history, prompt building, HTTP) dominate, then
+runs serve.py with each --workers value and drives /chat from --clients
+load-generator processes for --duration seconds. Reports requests per
+second, the speedup over one worker, and how much of the workers' memory
+is shared (RSS against PSS). Also checks that one session keeps its whole
+history when its turns land on different workers.
+
+    python benchmarks/bench_prefork.py --workers 1 2 4 --corpus 20000 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_chat import MESSAGES, summarize
+
+ROOT = Path(__file__).parent.parent
+
+INGEST = """
+import sys
+from benchmarks.bench_chat import synthetic_corpus
+from utils import rag
+from utils.ingest import ingest
+ingest(synthetic_corpus(int(sys.argv[1])), rag.components.vectorstore, rag.components.embeddings)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(port, method, path, body=None, cookie=None, conn=None):
+    conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    if cookie:
+        headers["Cookie"] = cookie
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    payload = response.read()
+    cookie = (response.getheader("Set-Cookie") or "").split(";")[0] or cookie
+    return response.status, payload, cookie
+
+
+def wait_ready(port, workers, timeout=120):
+    """Wait until --workers consecutive /readyz probes (fresh connections) succeed."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if time.monotonic() > deadline:
+            raise TimeoutError("workers did not become ready")
+        try:
+            status, _, _ = request(port, "GET", "/readyz")
+        except OSError:
+            status = None
+        streak = streak + 1 if status == 200 else 0
+        if status != 200:
+            time.sleep(0.1)
+
+
+def load(port, duration, offset):
+    """One load-generator process: keep-alive /chat requests for ``duration`` seconds."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    latencies = []
+    errors = 0
+    stop = time.perf_counter() + duration
+    i = offset
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        try:
+            status, _, _ = request(port, "POST", "/chat", {"message": MESSAGES[i % len(MESSAGES)]}, conn=conn)
+            errors += status != 200
+        except OSError:
+            errors += 1
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+    return latencies, errors
+
+
+def session_continuity(port, turns=6):
+    """Send turns on fresh connections and check /history saw all of them."""
+    cookie = None
+    for turn in range(turns):
+        _, _, cookie = request(port, "POST", "/chat", {"message": f"turn {turn}: {MESSAGES[turn % len(MESSAGES)]}"},
+                               cookie=cookie)
+    _, payload, _ = request(port, "GET", "/history?limit=200", cookie=cookie)
+    return len(json.loads(payload)["messages"]) == 2 * turns
+
+
+def memory(master_pid):
+    """Summed RSS and PSS of the master's workers, in MiB."""
+    rss = pss = 0
+    children = Path(f"/proc/{master_pid}/task/{master_pid}/children").read_text().split()
+    for pid in children:
+        # Skip multiprocessing's resource tracker, started by the preload export
+        if b"serve.py" not in Path(f"/proc/{pid}/cmdline").read_bytes():
+            continue
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            name, _, value = line.partition(":")
+            if name == "Rss":
+                rss += int(value.split()[0])
+            elif name == "Pss":
+                pss += int(value.split()[0])
+    return rss / 1024, pss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="load-generator processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--corpus", type=int, default=5000, help="knowledge-base documents")
+    args = parser.parse_args()
+
+    fake_port = free_port()
+    fake = subprocess.Popen(
+        [sys.executable, "benchmarks/fake_ollama.py", "--port", str(fake_port), "--embed-latency", "0",
+         "--chat-latency", "0", "--tokens-per-second", "1000000", "--reply-tokens", "5"],
+        cwd=ROOT, stdout=subprocess.DEVNULL)
+    env = dict(os.environ, OLLAMA_HOST=f"http://127.0.0.1:{fake_port}",
+               SOULSPACE_DATABASE=tempfile.mkdtemp(prefix="soulspace-bench-"))
+    env.pop("OLLAMA_HOSTS", None)
+    time.sleep(0.5)
+    subprocess.run([sys.executable, "-c", INGEST, str(args.corpus)], cwd=ROOT, env=env, check=True)
+    print(f"Loaded {args.corpus} documents; {os.cpu_count()} CPUs")
+
+    results = {}
+    try:
+        for workers in args.workers:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+            try:
+                wait_ready(port, workers)
+                continuity = session_continuity(port)
+                with ProcessPoolExecutor(max_workers=args.clients) as pool:
+                    runs = list(pool.map(load, [port] * args.clients, [args.duration] * args.clients,
+                                         range(args.clients)))
+                rss, pss = memory(server.pid)
+            finally:
+                server.terminate()
+                server.wait()
+            latencies = [value for run, _ in runs for value in run]
+            results[workers] = {
+                "rps": len(latencies) / args.duration,
+                "errors": sum(errors for _, errors in runs),
+                "latency": summarize(latencies),
+                "rss_mib": rss,
+                "pss_mib": pss,
+                "continuity": continuity,
+            }
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    # Speedup is relative to the first --workers value
+    base = results[args.workers[0]]["rps"]
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} "
+          f"{'RSS MiB':>8} {'PSS MiB':>8}  history kept")
+    for workers, stats in results.items():
+        print(f"{workers:>7} {stats['rps']:>9.1f} {stats['rps'] / base:>7.2f}x "
+              f"{stats['latency']['p50_ms']:>8.1f} {stats['latency']['p99_ms']:>8.1f} {stats['errors']:>6} "
+              f"{stats['rss_mib']:>8.0f} {stats['pss_mib']:>8.0f}  {'yes' if stats['continuity'] else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
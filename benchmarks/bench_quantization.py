@@ -0,0 +1,100 @@
+"""Recall, memory and latency of the quantized NumPy index.
+
+Builds a synthetic knowledge base of --corpus passages with clustered,
+anisotropic 768-dimensional embeddings (a shared direction plus a topic
+and per-passage noise, as sentence embeddings have), then searches it with
+perturbed passages as queries. Each configuration is compared with exact
+float32 search: recall@k is the share of the exact top k it returns. The
+memory column is what a query scans and so has to stay in RAM (the codes,
+or the whole matrix without quantization); the re-ranked rows are read
+from the full-precision file on disk.
+
+    python benchmarks/bench_quantization.py --corpus 100000 --queries 200 --rerank 4 10 20
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from benchmarks.bench_chat import synthetic_corpus
+from utils.vector_index import NumpyIndex
+
+
+def synthetic_embeddings(size, dim, topics, seed=0):
+    rng = np.random.default_rng(seed)
+    shared = rng.normal(size=dim).astype(np.float32)
+    shared *= 2 / np.linalg.norm(shared)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = shared + centers[rng.integers(0, topics, size)]
+    vectors += rng.normal(0, 0.6 / np.sqrt(dim), (size, dim)).astype(np.float32)
+    return vectors
+
+
+def measure(index, queries, k):
+    results = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search_batch([query], k)[0][0].tolist())
+        timings.append((time.perf_counter() - start) * 1000)
+    return results, timings
+
+
+def scanned_bytes(index):
+    return index.codes.nbytes if index.quantization else index.matrix.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=100_000, help="passages")
+    parser.add_argument("--dim", type=int, default=768, help="embedding size (nomic-embed-text: 768)")
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[4, 10, 20],
+                        help="candidates re-ranked per result")
+    args = parser.parse_args()
+
+    chunks = synthetic_corpus(args.corpus)
+    ids = [chunk_id for chunk_id, _, _ in chunks]
+    documents = [text for _, text, _ in chunks]
+    metadatas = [metadata for _, _, metadata in chunks]
+    vectors = synthetic_embeddings(args.corpus, args.dim, args.topics)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.corpus, args.queries)]
+    queries = queries + rng.normal(0, 0.4 / np.sqrt(args.dim), queries.shape).astype(np.float32)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        exact = None
+        for dtype, quantization in (("float32", None), ("float16", None), ("float32", "int8"),
+                                    ("float32", "binary")):
+            index = NumpyIndex.write(Path(directory, f"{dtype}-{quantization}"), ids, vectors, documents,
+                                     metadatas, dtype, quantization)
+            index.search_batch(queries[:5], args.k)  # fault the scanned pages in
+            for rerank in (args.rerank if quantization else [None]):
+                if rerank is not None:
+                    index.rerank = rerank
+                results, timings = measure(index, queries, args.k)
+                if exact is None:
+                    exact = results
+                recall = statistics.mean(len(set(a) & set(b)) / args.k for a, b in zip(results, exact))
+                label = f"{dtype}" if quantization is None else f"{quantization} rerank {rerank}"
+                rows.append((label, recall, scanned_bytes(index) / 2 ** 20, statistics.median(timings),
+                             np.percentile(timings, 95)))
+
+    print(f"{args.corpus} passages, {args.dim} dimensions, {args.queries} queries, k={args.k}; "
+          f"recall against exact float32 search")
+    print(f"{'index':<20} {'recall@' + str(args.k):>9} {'RAM MiB':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, recall, mib, p50, p95 in rows:
+        print(f"{label:<20} {recall:>9.1%} {mib:>8.1f} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Multi-host Ollama routing against several stand-in servers.
+
+Starts --hosts fake Ollama servers and sends chat requests from concurrent
+sessions through one OllamaRouter. Part way through, one host starts
+failing and later recovers, so the run shows the request spread per host,
+failovers, how often a session stayed on its previous host, and whether any
+request was lost.
+
+    python benchmarks/bench_routing.py --hosts 3 --sessions 24 --requests 600
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_chat import summarize
+from benchmarks.fake_ollama import FakeOllama
+from utils.ollama_router import OllamaRouter
+
+
+def run_session(router, session_id, count, results, lock):
+    previous = None
+    for i in range(count):
+        start = time.perf_counter()
+        try:
+            router.chat(model="mistral", messages=[{"role": "user", "content": f"turn {i}"}],
+                        session_id=session_id)
+            error = None
+        except Exception as e:
+            error = e
+        elapsed = (time.perf_counter() - start) * 1000
+        host = router._sticky.get(session_id)
+        with lock:
+            results["latencies"].append(elapsed)
+            results["errors"] += error is not None
+            if previous is not None and error is None:
+                results["repeat_turns"] += 1
+                results["same_host"] += host == previous
+        previous = host
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=24, help="concurrent sessions")
+    parser.add_argument("--requests", type=int, default=600, help="total chat requests")
+    parser.add_argument("--chat-latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--fail-at", type=float, default=0.3, help="fraction of the run when host 0 fails")
+    parser.add_argument("--recover-at", type=float, default=0.6, help="fraction of the run when it recovers")
+    args = parser.parse_args()
+
+    servers = [FakeOllama(chat_latency=args.chat_latency, tokens_per_second=args.tokens_per_second).start()
+               for _ in range(args.hosts)]
+    router = OllamaRouter([server.url for server in servers], health_interval=0.5, eject_seconds=2)
+    results = {"latencies": [], "errors": 0, "repeat_turns": 0, "same_host": 0}
+    lock = threading.Lock()
+
+    # Estimate the run time from the first requests, then fail and recover host 0
+    estimate = args.requests / args.sessions * args.chat_latency * 1.5
+
+    def chaos():
+        time.sleep(estimate * args.fail_at)
+        servers[0].failing = True
+        print(f"{servers[0].url} failing")
+        time.sleep(estimate * (args.recover_at - args.fail_at))
+        servers[0].failing = False
+        print(f"{servers[0].url} recovered")
+
+    threading.Thread(target=chaos, daemon=True).start()
+    per_session, extra = divmod(args.requests, args.sessions)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [pool.submit(run_session, router, f"session-{i}", per_session + (i < extra), results, lock)
+                   for i in range(args.sessions)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    stats = router.stats()
+    latency = summarize(results["latencies"])
+    print(f"{len(results['latencies'])} requests over {args.hosts} hosts in {elapsed:.1f}s "
+          f"({len(results['latencies']) / elapsed:.1f} req/s)")
+    print(f"  latency p50 {latency['p50_ms']:.1f}  p95 {latency['p95_ms']:.1f}  p99 {latency['p99_ms']:.1f} ms")
+    for i, server in enumerate(servers):
+        print(f"  host {i} {server.url}: {server.requests.get('/api/chat', 0)} chats received, "
+              f"{stats[f'host{i}_failures']} failures")
+    print(f"  failovers {stats['failovers']}, lost requests {results['errors']}")
+    if results["repeat_turns"]:
+        print(f"  session stayed on its host for {results['same_host'] / results['repeat_turns']:.1%} of turns")
+
+    for server in servers:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
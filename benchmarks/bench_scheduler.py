@@ -0,0 +1,126 @@
+"""Fair generation scheduling under a chatty client, against stand-in Ollama hosts.
+
+Starts --hosts fake Ollama servers that each generate --parallel chats at
+once and queue the rest, like Ollama. One chatty session keeps --chatty
+requests in flight the whole time while --sessions ordinary sessions each
+send a first message and then follow-ups with a pause between them. The run
+is repeated with every request going straight to the router ("direct",
+first come first served at the hosts) and through the FairScheduler with a
+per-host max-in-flight ("fair"), and reports latency per kind of request,
+each side's share of the generations, queue depth and wait, and the most
+chats any host ran at once.
+
+    python benchmarks/bench_scheduler.py --hosts 2 --parallel 2 --chatty 16 --sessions 8 --duration 15
+"""
+import argparse
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_chat import summarize
+from benchmarks.fake_ollama import FakeOllama
+from utils.ollama_router import OllamaRouter
+from utils.scheduler import FairScheduler
+
+
+class Run:
+    def __init__(self, router, scheduler):
+        self.router = router
+        self.scheduler = scheduler
+        self.latencies = {"first": [], "followup": [], "chatty": []}
+        self.waits = []
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def generate(self, session_id, priority, kind):
+        start = time.perf_counter()
+        slot = self.scheduler.slot(session_id, priority) if self.scheduler else nullcontext()
+        with slot:
+            admitted = time.perf_counter()
+            self.router.chat(model="mistral", messages=[{"role": "user", "content": kind}],
+                             session_id=session_id)
+        end = time.perf_counter()
+        if self.stop.is_set():
+            return  # finished after the measured window
+        with self.lock:
+            self.latencies[kind].append((end - start) * 1000)
+            self.waits.append((admitted - start) * 1000)
+
+    def chatty(self):
+        while not self.stop.is_set():
+            self.generate("chatty", "followup", "chatty")
+
+    def session(self, session_id, pause):
+        self.generate(session_id, "first", "first")
+        while not self.stop.is_set():
+            time.sleep(pause)
+            self.generate(session_id, "followup", "followup")
+
+
+def run(mode, args, urls):
+    router = OllamaRouter(urls, health_interval=0, max_in_flight=args.parallel if mode == "fair" else None)
+    scheduler = FairScheduler(router.capacity, max_queue=10_000) if mode == "fair" else None
+    state = Run(router, scheduler)
+    depths = []
+
+    def sample():
+        while not state.stop.is_set():
+            if scheduler is not None:
+                depths.append(scheduler.queued)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=sample)]
+    threads += [threading.Thread(target=state.chatty) for _ in range(args.chatty)]
+    # Ordinary sessions arrive after the chatty client has filled the queue
+    threads += [threading.Thread(target=state.session, args=(f"session-{i}", args.pause))
+                for i in range(args.sessions)]
+    for thread in threads[:args.chatty + 1]:
+        thread.start()
+    time.sleep(0.5)
+    for thread in threads[args.chatty + 1:]:
+        thread.start()
+    time.sleep(args.duration)
+    state.stop.set()
+    for thread in threads:
+        thread.join()
+    return state, depths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=2)
+    parser.add_argument("--parallel", type=int, default=2, help="chats each host generates at once")
+    parser.add_argument("--chatty", type=int, default=16, help="requests the chatty session keeps in flight")
+    parser.add_argument("--sessions", type=int, default=8, help="ordinary sessions")
+    parser.add_argument("--pause", type=float, default=0.5, help="seconds between an ordinary session's turns")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    args = parser.parse_args()
+
+    for mode in ("direct", "fair"):
+        servers = [FakeOllama(chat_latency=args.chat_latency, tokens_per_second=args.tokens_per_second,
+                              parallel=args.parallel).start() for _ in range(args.hosts)]
+        state, depths = run(mode, args, [server.url for server in servers])
+        for server in servers:
+            server.stop()
+
+        total = sum(len(values) for values in state.latencies.values())
+        print(f"{mode}: {total} generations in {args.duration:.0f}s")
+        for kind, values in state.latencies.items():
+            stats = summarize(values)
+            print(f"  {kind:<9} n={stats['count']:<5} share {stats['count'] / max(total, 1):6.1%}  "
+                  f"p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}  p99 {stats['p99_ms']:8.1f} ms")
+        waits = summarize(state.waits)
+        if depths:
+            print(f"  scheduler wait p50 {waits['p50_ms']:.1f}  p95 {waits['p95_ms']:.1f} ms, "
+                  f"queue depth mean {sum(depths) / len(depths):.1f}  max {max(depths)}")
+        print(f"  most chats one host ran at once: {max(server.peak_active for server in servers)} "
+              f"(hosts generate {args.parallel} at a time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Cold-start cost of the Flask app: import time, readiness and first request.
+
+Each run starts a fresh interpreter against the stand-in Ollama server and
+a throwaway database, imports app.py, then times either the background
+warm-up (until /readyz answers 200) followed by the first /chat, or, with
+warm-up off, the first /chat on its own. Reports the median over --runs.
+
+    python benchmarks/bench_startup.py --runs 5 --output bench_startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.fake_ollama import FakeOllama
+
+ROOT = Path(__file__).parent.parent
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/healthz')
+alive = time.perf_counter()
+ready = None
+if app.WARMUP:
+    while client.get('/readyz').status_code != 200:
+        if time.perf_counter() - start > 120:
+            sys.exit('warm-up did not finish')
+        time.sleep(0.005)
+    ready = time.perf_counter()
+before_chat = time.perf_counter()
+client.post('/chat', json={'message': 'I feel anxious today'})
+done = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'healthz_s': alive - start,
+    'ready_s': None if ready is None else ready - start,
+    'first_chat_s': done - before_chat,
+    'total_s': done - start,
+    'stages': app.warm_up.stages,
+}))
+"""
+
+
+def run_child(fake_url, warmup):
+    env = dict(os.environ, OLLAMA_HOST=fake_url, SOULSPACE_WARMUP="1" if warmup else "0",
+               SOULSPACE_DATABASE=tempfile.mkdtemp(prefix="soulspace-bench-"))
+    env.pop("OLLAMA_HOSTS", None)
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default="bench_startup.json")
+    args = parser.parse_args()
+
+    fake = FakeOllama(chat_latency=0.05, tokens_per_second=2000).start()
+    results = {}
+    for warmup in (False, True):
+        runs = [run_child(fake.url, warmup) for _ in range(args.runs)]
+        label = "warm-up" if warmup else "lazy"
+        results[label] = {
+            key: statistics.median(run[key] for run in runs)
+            for key in ("import_s", "healthz_s", "ready_s", "first_chat_s", "total_s")
+            if runs[0][key] is not None
+        }
+        results[label]["stages"] = runs[-1]["stages"]
+    fake.stop()
+
+    for label, stats in results.items():
+        print(f"{label}:")
+        for key, value in stats.items():
+            if key != "stages":
+                print(f"  {key:<14} {value * 1000:9.1f} ms")
+        if stats["stages"]:
+            print("  warm-up stages " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in stats["stages"].items()))
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
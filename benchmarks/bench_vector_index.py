@@ -0,0 +1,105 @@
+"""Parity and latency of the NumPy index against Chroma.
+
+Loads --synthetic fixed, clustered vectors into an in-memory Chroma collection
+(or, with --database, uses the therapy_knowledge collection), exports it to
+a memory-mapped matrix, runs the same query vectors through both backends
+and reports how often the top-k ids agree, then compares per-query and
+batched latency. Exits with an error when fewer than --min-agreement of
+the queries return identical top-k ids.
+
+    python benchmarks/bench_vector_index.py --queries 200 --dtype float16
+    python benchmarks/bench_vector_index.py --database --quantization int8
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from benchmarks.bench_quantization import synthetic_embeddings
+from utils.vector_index import NumpyIndex
+
+
+def timed(fn, items):
+    timings = []
+    results = []
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        timings.append((time.perf_counter() - start) * 1000)
+    return results, timings
+
+
+def synthetic_collection(size, dim, seed=0):
+    """In-memory Chroma collection of ``size`` fixed, clustered unit vectors."""
+    import chromadb
+    vectors = synthetic_embeddings(size, dim, topics=max(1, size // 20), seed=seed)
+    # Unit length, as Ollama's embeddings are, so Chroma's L2 ranks like the index's cosine
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"parity_{seed}")
+    for start in range(0, size, 1000):
+        stop = min(start + 1000, size)
+        collection.add(ids=[f"doc_{i}" for i in range(start, stop)],
+                       embeddings=vectors[start:stop].tolist(),
+                       documents=[f"document {i}" for i in range(start, stop)])
+    return collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--quantization", choices=["int8", "binary"])
+    parser.add_argument("--synthetic", type=int, default=2000, help="random vectors to test with")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--database", action="store_true", help="use the therapy_knowledge collection")
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="share of queries whose top-k ids must match Chroma's")
+    args = parser.parse_args()
+
+    if args.database:
+        from utils import rag
+        collection = rag.components.vectorstore._collection
+    else:
+        collection = synthetic_collection(args.synthetic, args.dim)
+    with tempfile.TemporaryDirectory() as directory:
+        index = NumpyIndex.export(collection, directory, args.dtype, args.quantization)
+        if index.count == 0:
+            sys.exit("therapy_knowledge is empty; run python -m utils.embeddings first")
+
+        # Stored documents, perturbed, stand in for user queries
+        rng = np.random.default_rng(0)
+        picks = rng.integers(0, index.count, args.queries)
+        queries = np.asarray(index.matrix[picks], dtype=np.float32)
+        queries += rng.normal(0, 0.05, queries.shape).astype(np.float32)
+
+        chroma, chroma_ms = timed(
+            lambda q: collection.query(query_embeddings=[q.tolist()], n_results=args.k,
+                                       include=[])["ids"][0],
+            queries)
+        numpy, numpy_ms = timed(
+            lambda q: [index.ids[i] for i, _ in index.search(q, args.k)], queries)
+
+        start = time.perf_counter()
+        index.search_batch(queries, args.k)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+    agree = sum(a == b for a, b in zip(chroma, numpy)) / len(queries)
+    overlap = statistics.mean(len(set(a) & set(b)) / args.k for a, b in zip(chroma, numpy))
+    print(f"{index.count} documents, {args.queries} queries, k={args.k}, {args.dtype}"
+          f"{', ' + args.quantization if args.quantization else ''}")
+    print(f"parity: identical top-{args.k} {agree:.1%}, id overlap {overlap:.1%}")
+    print(f"chroma  p50 {statistics.median(chroma_ms):8.3f} ms")
+    print(f"numpy   p50 {statistics.median(numpy_ms):8.3f} ms")
+    print(f"numpy batch {batch_ms / len(queries):8.3f} ms/query")
+    if agree < args.min_agreement:
+        sys.exit(f"FAIL: identical top-{args.k} {agree:.1%} is below {args.min_agreement:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Local stand-in for the parts of the Ollama HTTP API that SoulSpace uses.
+
+Embeddings are deterministic hashed bag-of-words vectors, so texts that
+share words land near each other. Chat replies are canned text streamed at
+a configurable token rate after a configurable time to first token. Like
+Ollama, the server keeps the last few prompts (with their replies) cached
+and only evaluates, and charges --prefill-per-token for, the part of a new
+prompt that does not share a prefix with one of them. With --parallel, at
+most that many chats are generated at once and the rest wait their turn in
+arrival order, as with Ollama's OLLAMA_NUM_PARALLEL.
+
+    python benchmarks/fake_ollama.py --port 11434 --chat-latency 0.4 --tokens-per-second 40
+
+or, from a benchmark:
+
+    with FakeOllama(chat_latency=0.2) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("It makes sense that you feel this way. Let's try the 5-4-3-2-1 grounding "
+         "technique together, then a slow breathing exercise. What usually helps you "
+         "feel a little calmer when this happens?")
+
+
+def embed(text, dim):
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        for i in range(0, 8, 2):
+            vector[int.from_bytes(digest[i:i + 2], "little") % dim] += 1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload):
+        line = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server.fake
+        if server.failing:
+            return self._send_json({"error": "unavailable"}, 503)
+        if self.path == "/api/tags":
+            return self._send_json({"models": [{"name": name, "model": name}
+                                               for name in ("mistral", "nomic-embed-text")]})
+        if self.path == "/api/version":
+            return self._send_json({"version": "0.0.0-fake"})
+        self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        server = self.server.fake
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with server.lock:
+            server.requests[self.path] = server.requests.get(self.path, 0) + 1
+        if server.failing:
+            return self._send_json({"error": "unavailable"}, 503)
+
+        if self.path in ("/api/embed", "/api/embeddings"):
+            texts = request.get("input", request.get("prompt", ""))
+            texts = [texts] if isinstance(texts, str) else texts
+            time.sleep(server.embed_latency + server.embed_latency_per_item * len(texts))
+            vectors = [embed(text, server.dim) for text in texts]
+            if self.path == "/api/embeddings":
+                return self._send_json({"embedding": vectors[0]})
+            return self._send_json({"model": request.get("model"), "embeddings": vectors})
+
+        if self.path == "/api/chat":
+            try:
+                with server.slots:
+                    with server.lock:
+                        server.active += 1
+                        server.peak_active = max(server.peak_active, server.active)
+                    try:
+                        return self._chat(server, request)
+                    finally:
+                        with server.lock:
+                            server.active -= 1
+            except (BrokenPipeError, ConnectionResetError):
+                return  # the client gave up, as a cancelled request does
+        self._send_json({"error": "not found"}, 404)
+
+    def _chat(self, server, request):
+        prompt = "".join(f"<|{m.get('role')}|>{m.get('content', '')}" for m in request.get("messages", []))
+        tokens = [word + " " for word in REPLY.split()][:server.reply_tokens]
+        with server.lock:
+            reused = max((len(os.path.commonprefix([prompt, cached])) for cached in server.prompt_cache),
+                         default=0)
+        prompt_tokens = max(1, (len(prompt) - reused) // 4)
+        started = time.perf_counter()
+        time.sleep(server.chat_latency + prompt_tokens * server.prefill_per_token)
+        if request.get("keep_alive") not in (0, "0", "0s"):
+            with server.lock:
+                server.prompt_cache.append(prompt + "<|assistant|>" + "".join(tokens))
+                del server.prompt_cache[:-server.cache_slots]
+        first_token = time.perf_counter() - started
+        done = {
+            "model": request.get("model"),
+            "created_at": "1970-01-01T00:00:00Z",
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(first_token * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) / server.tokens_per_second * 1e9),
+        }
+
+        if not request.get("stream", True):
+            time.sleep(len(tokens) / server.tokens_per_second)
+            done["message"] = {"role": "assistant", "content": "".join(tokens)}
+            done["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            return self._send_json(done)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            self._send_chunk({"model": request.get("model"), "created_at": done["created_at"],
+                              "message": {"role": "assistant", "content": token}, "done": False})
+            time.sleep(1 / server.tokens_per_second)
+        done["message"] = {"role": "assistant", "content": ""}
+        done["total_duration"] = int((time.perf_counter() - started) * 1e9)
+        self._send_chunk(done)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOllama:
+    """Threaded stand-in Ollama server; use as a context manager or start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, embed_latency=0.01, embed_latency_per_item=0.001,
+                 chat_latency=0.2, tokens_per_second=50.0, reply_tokens=40, dim=256,
+                 prefill_per_token=0.0, cache_slots=4, parallel=None):
+        self.embed_latency = embed_latency
+        self.embed_latency_per_item = embed_latency_per_item
+        self.chat_latency = chat_latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.dim = dim
+        self.prefill_per_token = prefill_per_token
+        self.cache_slots = cache_slots
+        self.prompt_cache = []
+        self.failing = False
+        self.slots = threading.Semaphore(parallel) if parallel else nullcontext()
+        self.active = 0
+        self.peak_active = 0
+        self.requests = {}
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stand-in Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="seconds per embed call")
+    parser.add_argument("--chat-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--prefill-per-token", type=float, default=0.0,
+                        help="seconds per prompt token not served from the prompt cache")
+    parser.add_argument("--parallel", type=int, help="chats generated at once; the rest queue")
+    args = parser.parse_args()
+
+    server = FakeOllama(args.host, args.port, embed_latency=args.embed_latency,
+                        chat_latency=args.chat_latency, tokens_per_second=args.tokens_per_second,
+                        reply_tokens=args.reply_tokens, prefill_per_token=args.prefill_per_token,
+                        parallel=args.parallel)
+    print(f"Fake Ollama listening on {server.url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
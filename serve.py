@@ -0,0 +1,226 @@
+"""Pre-fork production server for SoulSpace.
+
+    python serve.py --workers 4 --port 5000
+
+The master process imports the app, loads the read-only retrieval data (the
+NumPy embedding index and the BM25 index) once and then forks --workers
+processes that accept connections on one shared listening socket. Workers
+share that data copy-on-write and keep conversation state in the SQLite
+store, so any worker can serve any turn of a session. Each worker builds
+its own Ollama, Chroma and embedding-cache connections after the fork and
+warms them up in the background, as the single-process app does.
+
+The master restarts workers that die. SIGHUP reloads the retrieval data
+(after an ingest, for example) and replaces the workers one set at a time.
+Each worker gets an equal share of every Ollama host's max_in_flight (at
+least one generation, rounded down) and queues the rest in its own
+scheduler, so a host is not sent more than the limit while workers do not
+outnumber it; after a SIGHUP the old workers' last generations briefly add
+to it. A worker with a free share does not take over a busy worker's queue.
+Workers switch to a newly activated knowledge version by themselves: the
+first to need its NumPy export writes it while the others wait, then they
+all memory-map the same files, which share the page cache. A hybrid BM25
+index is still built per worker; a SIGHUP afterwards shares it again.
+SIGTERM or SIGINT stops them after their in-flight requests finish.
+The Flask secret key is made before the fork, so session cookies are valid
+on every worker; /metrics reports the worker that answered.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+# Conversation state must be visible to every worker, and the NumPy index is
+# the vector search that can be shared between them
+os.environ.setdefault("SOULSPACE_MEMORY_BACKEND", "sqlite")
+os.environ.setdefault("SOULSPACE_RETRIEVER", "numpy")
+# Warm-up runs in each worker; a thread in the master would not survive the fork
+os.environ["SOULSPACE_WARMUP"] = "0"
+
+from werkzeug.serving import make_server
+
+import app as soulspace
+from utils import rag
+
+# Configuration
+SHUTDOWN_GRACE = 30  # seconds a stopping worker gets to finish its requests
+RESTART_DELAY = 1  # seconds between restarts of a worker that keeps dying
+
+
+def listen(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Load everything the workers share, then keep the GC off those pages."""
+    start = time.perf_counter()
+    rag.components.preload()
+    # Objects allocated so far are never collected, so the collector does not
+    # write to (and un-share) their pages in every worker
+    gc.freeze()
+    print(f"Preloaded retrieval data in {time.perf_counter() - start:.2f}s")
+
+
+def share_generation_limit(workers):
+    """Split each host's max_in_flight between the workers.
+
+    Every worker routes and schedules its own generations, so without this
+    a host would be sent up to workers * max_in_flight at once.
+    """
+    routing = rag.components.ollama_routing
+    limit = routing.get("max_in_flight")
+    if limit is None:
+        return
+    routing["max_in_flight"] = max(1, limit // workers)
+    if workers > limit:
+        print(f"Warning: {workers} workers may run {workers} generations per Ollama host, "
+              f"more than its max_in_flight of {limit}")
+
+
+def worker(sock, host, port):
+    """Serve requests on the inherited socket until SIGTERM; never returns."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    server = make_server(host, port, soulspace.app, threaded=True, fd=sock.fileno())
+    # Let shutdown wait for in-flight requests
+    server.daemon_threads = False
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    soulspace.warm_up.start()
+    code = 0
+    try:
+        server.serve_forever()
+        server.server_close()
+        if rag.HISTORY_MODE == "budget":
+            rag.history_window.join()
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        code = 1
+    sys.stdout.flush()
+    os._exit(code)
+
+
+class Master:
+    """Forks the workers and keeps --workers of them running."""
+
+    def __init__(self, sock, host, port, workers):
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.pids = set()
+        self.retiring = set()
+        self.stopping = False
+        self.reloading = False
+
+    def spawn(self):
+        # Unflushed output would otherwise be printed again by the child
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            worker(self.sock, self.host, self.port)
+        self.pids.add(pid)
+        return pid
+
+    def reap(self):
+        """Collect exited workers; returns how many died."""
+        died = 0
+        while self.pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            if pid in self.pids:
+                self.pids.discard(pid)
+                died += 1
+                if not self.stopping and pid not in self.retiring:
+                    print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+        return died
+
+    def terminate(self, pids, grace=SHUTDOWN_GRACE):
+        self.retiring |= pids
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + grace
+        while pids & self.pids and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in pids & self.pids:
+            os.kill(pid, signal.SIGKILL)
+        while pids & self.pids:
+            self.reap()
+            time.sleep(0.05)
+        self.retiring -= pids
+
+    def reload(self):
+        print("Reloading retrieval data")
+        old = set(self.pids)
+        gc.unfreeze()
+        try:
+            preload()
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return
+        for _ in range(self.workers):
+            self.spawn()
+        self.terminate(old)
+
+    def run(self):
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_reload(signum, frame):
+            self.reloading = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_reload)
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers")
+
+        while not self.stopping:
+            if self.reloading:
+                self.reloading = False
+                self.reload()
+            if self.reap():
+                time.sleep(RESTART_DELAY)
+                while not self.stopping and len(self.pids) < self.workers:
+                    self.spawn()
+            time.sleep(0.1)
+
+        self.terminate(set(self.pids))
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork production server for SoulSpace")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if rag.MEMORY_BACKEND != "sqlite":
+        sys.exit("serve.py needs SOULSPACE_MEMORY_BACKEND=sqlite so every worker sees each session")
+    share_generation_limit(args.workers)
+    sock = listen(args.host, args.port)
+    preload()
+    Master(sock, args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
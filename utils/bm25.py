@@ -0,0 +1,215 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from utils import metrics
+
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can
+could did do does doing for from had has have having he her here him his how i if in into is it
+its just me more most my myself no not now of off on once only or other our out over own same
+she should so some such than that the their them then there these they this those through to
+too under until up very was we were what when where which while who why will with would you
+your yourself
+""".split())
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords, with plural "s" stripped."""
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """In-memory Okapi BM25 index over the knowledge-base chunks.
+
+    ``add`` replaces chunks by id, so it can be passed straight to
+    ``ingest(on_batch=...)`` to keep the index in step with the collection.
+    ``search`` returns ``(Document, score, coverage)`` where coverage is the
+    IDF-weighted share of the query's terms that the document contains.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs = {}  # id -> (text, metadata, length, term counts)
+        self._postings = {}  # term -> {id: term count}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_collection(cls, collection, page_size=5000, **kwargs):
+        index = cls(**kwargs)
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(zip(page["ids"], page["documents"], page["metadatas"]))
+            offset += len(page["ids"])
+        return index
+
+    @property
+    def count(self):
+        return len(self._docs)
+
+    def fingerprint(self):
+        """``fingerprint`` of the indexed chunks, to compare with the collection's."""
+        from utils.vector_index import fingerprint
+        with self._lock:
+            ids = list(self._docs)
+            documents = [self._docs[chunk_id][0] for chunk_id in ids]
+            metadatas = [self._docs[chunk_id][1] for chunk_id in ids]
+        return fingerprint(ids, documents, metadatas)
+
+    def add(self, chunks):
+        """Index ``(id, text, metadata)`` chunks, replacing any with the same id."""
+        with self._lock:
+            for chunk_id, text, metadata in chunks:
+                self._remove(chunk_id)
+                terms = Counter(tokenize(text or ""))
+                length = sum(terms.values())
+                self._docs[chunk_id] = (text, metadata or {}, length, terms)
+                self._total_length += length
+                for term, count in terms.items():
+                    self._postings.setdefault(term, {})[chunk_id] = count
+
+    def remove(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        old = self._docs.pop(chunk_id, None)
+        if old is None:
+            return
+        self._total_length -= old[2]
+        for term in old[3]:
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+
+    def _idf(self, term):
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self._docs) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=3):
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._docs:
+                return []
+            idf = {term: self._idf(term) for term in terms}
+            average = self._total_length / len(self._docs) or 1
+            scores = {}
+            for term in terms:
+                for chunk_id, count in self._postings.get(term, {}).items():
+                    length = self._docs[chunk_id][2]
+                    norm = self.k1 * (1 - self.b + self.b * length / average)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * count * (self.k1 + 1) / (count + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            weight = sum(idf.values())
+            results = []
+            for chunk_id, score in best:
+                text, metadata, _, counts = self._docs[chunk_id]
+                coverage = sum(idf[term] for term in terms if term in counts) / weight
+                results.append((Document(page_content=text, metadata=metadata, id=chunk_id), score, coverage))
+            return results
+
+
+class HybridRetriever:
+    """Fuses BM25 and vector search with reciprocal rank fusion.
+
+    When the best lexical hit covers at least ``fast_path_coverage`` of the
+    query, the lexical results are returned as they are and the query is
+    never embedded. Otherwise both result lists are merged by RRF. Chunks
+    written by another process (the ingestion CLI) are picked up by
+    reloading the lexical index once the collection's chunks differ from it
+    by id or content, checked at most every ``refresh_interval`` seconds.
+    """
+
+    def __init__(self, vector, lexical, collection, fast_path_coverage=0.8, rrf_k=60,
+                 candidates=10, refresh_interval=30):
+        self.vector = vector
+        self.lexical = lexical
+        self.collection = collection
+        self.fast_path_coverage = fast_path_coverage
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.refresh_interval = refresh_interval
+        self._checked = time.monotonic()
+        self._refreshing = threading.Lock()
+
+    def similarity_search(self, query, k=3):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k)]
+
+    def similarity_search_with_relevance_scores(self, query, k=3, score_threshold=None):
+        """``(Document, relevance)`` pairs, best first.
+
+        Relevance is the vector side's similarity or, for a document only the
+        lexical side found, its coverage of the query. With
+        ``score_threshold`` either side drops its hits that score below it.
+        """
+        self._maybe_refresh()
+        lexical = [(doc, coverage) for doc, _, coverage in self.lexical.search(query, max(k, self.candidates))]
+        fast_path = bool(lexical) and lexical[0][1] >= self.fast_path_coverage
+        if score_threshold is not None:
+            lexical = [(doc, coverage) for doc, coverage in lexical if coverage >= score_threshold]
+        if fast_path:
+            metrics.retrieval_paths.inc(path="lexical")
+            metrics.note("retrieval_path", "lexical")
+            return lexical[:k]
+
+        metrics.retrieval_paths.inc(path="hybrid")
+        metrics.note("retrieval_path", "hybrid")
+        vector = self.vector.similarity_search_with_relevance_scores(query, k=max(k, self.candidates))
+        if score_threshold is not None:
+            vector = [(doc, score) for doc, score in vector if score >= score_threshold]
+        return self.fuse([lexical, vector], k)
+
+    def fuse(self, rankings, k):
+        """Merge ``(Document, relevance)`` rankings by RRF, keeping each document's best relevance."""
+        scores, docs, relevance = {}, {}, {}
+        for ranking in rankings:
+            for rank, (doc, score) in enumerate(ranking):
+                key = doc.id or doc.page_content
+                docs.setdefault(key, doc)
+                relevance[key] = max(relevance.get(key, score), score)
+                scores[key] = scores.get(key, 0.0) + 1 / (self.rrf_k + rank + 1)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(docs[key], relevance[key]) for key in best]
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.refresh_interval or not self._refreshing.acquire(blocking=False):
+            return
+        self._checked = now
+
+        def reload():
+            from utils.vector_index import collection_fingerprint
+            try:
+                # Ingest rewrites changed chunks under the same ids, so the count alone can match
+                if collection_fingerprint(self.collection) != self.lexical.fingerprint():
+                    self.lexical = BM25Index.from_collection(
+                        self.collection, k1=self.lexical.k1, b=self.lexical.b)
+            except Exception as e:
+                print(f"Error: {str(e)}")
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=reload, name="bm25-refresh", daemon=True).start()
+
+
+__all__ = ['BM25Index', 'HybridRetriever', 'tokenize']
@@ -0,0 +1,351 @@
+import fcntl
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.bm25 import BM25Index, HybridRetriever
+from utils.embed_batcher import BatchingEmbeddings
+from utils.embedding_cache import CachedEmbeddings
+from utils.ollama_router import OllamaRouter, RoutedEmbeddings
+
+
+def export_index(persist_directory, collection_name, index_directory, dtype="float32", quantization=None):
+    """Bring the NumPy export of a collection up to date; used by ``preload``."""
+    import chromadb
+    collection = chromadb.PersistentClient(path=persist_directory).get_or_create_collection(collection_name)
+    current_index(collection, index_directory, dtype, quantization)
+
+
+def current_index(collection, index_directory, dtype="float32", quantization=None, rerank=10):
+    """The NumPy export of ``collection``, redone when the collection's chunks or the codes wanted differ."""
+    from utils.vector_index import NumpyIndex, collection_fingerprint
+
+    def current():
+        if Path(index_directory, "meta.json").exists():
+            index = NumpyIndex(index_directory, rerank=rerank)
+            if index.quantization == quantization and index.fingerprint == collection_fingerprint(collection):
+                return index
+        return None
+
+    index = current()
+    if index is not None:
+        return index
+    # One process exports at a time; the others wait and load what it wrote
+    Path(index_directory).mkdir(parents=True, exist_ok=True)
+    with open(Path(index_directory, "export.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = current()
+        if index is None:
+            index = NumpyIndex.export(collection, index_directory, dtype, quantization)
+            index.rerank = rerank
+    return index
+
+
+def cosine_relevance(distance):
+    """Chroma's relevance score as cosine similarity, matching the NumPy index."""
+    # Collections use Chroma's default squared L2 distance, which between unit
+    # vectors (as Ollama's embed endpoint returns them) is 2 - 2 * cosine.
+    # Clamped to LangChain's [0, 1]: opposed chunks would otherwise score below
+    # zero and make it warn, dumping the documents into the log
+    return min(1.0, max(0.0, 1 - distance / 2))
+
+
+class ComponentPool:
+    """Process-wide home for the long-lived RAG components.
+
+    Each component is built on first use and then shared by every request.
+    A component is only rebuilt after a request that used it has failed.
+    The Ollama client and the embeddings are not among those: the router
+    ejects and readmits failing hosts itself, and rebuilding would throw
+    away its host state and the embedding cache.
+    Chroma and NumPy are imported by their builders, so creating the pool
+    is cheap.
+
+    ``preload`` loads the read-only retrieval data up front so that worker
+    processes forked afterwards share it copy-on-write. Built components hold
+    sockets, SQLite handles and threads that do not survive a fork, so a
+    forked child starts without any and builds its own on first use.
+
+    With ``versions`` set, the collection searched is whichever knowledge
+    version is live. ``sync`` notices a swap, drops the retriever and vector
+    store so the next request builds them on the new version, and calls each
+    of ``swap_listeners`` with the old and new collection names.
+    """
+
+    def __init__(self, ollama_hosts, embedding_model, collection_name, persist_directory,
+                 ollama_routing=None, embedding_cache=None, embedding_batch=None, retriever="chroma",
+                 index_directory=None, index_dtype="float32", index_quantization=None, index_rerank=10,
+                 index_check_interval=30, hybrid=None, versions=None):
+        # A single URL or a list of Ollama hosts shared by chat and embeddings
+        self.ollama_hosts = [ollama_hosts] if isinstance(ollama_hosts, str) else list(ollama_hosts)
+        # Keyword arguments for OllamaRouter
+        self.ollama_routing = ollama_routing or {}
+        self.embedding_model = embedding_model
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        # Keyword arguments for CachedEmbeddings, or None to embed uncached
+        self.embedding_cache = embedding_cache
+        # Keyword arguments for BatchingEmbeddings, or None to embed each call alone
+        self.embedding_batch = embedding_batch
+        # "chroma" searches the vector store, "numpy" a memory-mapped export of it
+        self.retriever_kind = retriever
+        self.index_directory = index_directory
+        self.index_dtype = index_dtype
+        # "int8" or "binary" codes scanned before re-ranking index_rerank * k rows exactly
+        self.index_quantization = index_quantization
+        self.index_rerank = index_rerank
+        # Seconds between checks that the NumPy export still matches the collection, or None
+        self.index_check_interval = index_check_interval
+        self._index_checked = time.monotonic()
+        self._index_checking = threading.Lock()
+        # Keyword arguments for HybridRetriever, or None for vector search only
+        self.hybrid = hybrid
+        # KnowledgeVersions naming the live collection, or None for collection_name as is
+        self.versions = versions
+        self.swap_listeners = []
+        # Collection the built retriever and vector store search
+        self.serving = None
+        self._lock = threading.RLock()
+        self._components = {}
+        # Preloaded read-only data: "index" (NumpyIndex) and "lexical" (BM25Index) for "collection"
+        self._shared = {}
+        self._builders = {
+            "embeddings": self._build_embeddings,
+            "vectorstore": self._build_vectorstore,
+            "client": self._build_client,
+            "retriever": self._build_retriever,
+        }
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _build_embeddings(self):
+        embeddings = RoutedEmbeddings(self.get("client"), self.embedding_model)
+        if self.embedding_batch is not None:
+            embeddings = BatchingEmbeddings(embeddings, **self.embedding_batch)
+        if self.embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, self.embedding_model, **self.embedding_cache)
+        return embeddings
+
+    def _build_vectorstore(self):
+        self.serving = self.live_collection()
+        return self.open_collection(self.serving)
+
+    def live_collection(self):
+        return self.versions.active() if self.versions is not None else self.collection_name
+
+    def open_collection(self, name):
+        from langchain_chroma import Chroma
+        return Chroma(
+            collection_name=name,
+            embedding_function=self.get("embeddings"),
+            persist_directory=self.persist_directory,
+            relevance_score_fn=cosine_relevance
+        )
+
+    def drop_collection(self, name):
+        """Delete a knowledge version's collection and its NumPy export."""
+        self.open_collection(name).delete_collection()
+        directory = self._index_directory(name)
+        if name != self.collection_name:
+            shutil.rmtree(directory, ignore_errors=True)
+            return
+        # The versions' exports live in subdirectories of this one
+        for path in directory.glob("*"):
+            if path.is_file():
+                path.unlink(missing_ok=True)
+
+    def _index_directory(self, name):
+        # The unversioned collection keeps its export where it always was
+        if name == self.collection_name:
+            return Path(self.index_directory)
+        return Path(self.index_directory, name)
+
+    def _preloaded(self, key):
+        # Only data preloaded for the collection being served
+        self.get("vectorstore")
+        if self._shared.get("collection") == self.serving:
+            return self._shared.get(key)
+        return None
+
+    def _build_retriever(self):
+        retriever = self._build_vector_retriever()
+        if self.hybrid is None:
+            return retriever
+        collection = self.get("vectorstore")._collection
+        lexical = self._preloaded("lexical") or BM25Index.from_collection(collection)
+        return HybridRetriever(retriever, lexical, collection, **self.hybrid)
+
+    def _build_vector_retriever(self):
+        if self.retriever_kind == "chroma":
+            return self.get("vectorstore")
+        index = self._preloaded("index") or self._load_index()
+        index.embedding_function = self.get("embeddings")
+        return index
+
+    def _load_index(self):
+        collection = self.get("vectorstore")._collection
+        return current_index(collection, self._index_directory(self.serving), self.index_dtype,
+                             self.index_quantization, self.index_rerank)
+
+    def _check_index(self):
+        """Drop a NumPy retriever whose export no longer matches its collection.
+
+        Ingest rewrites changed chunks under the same ids, so the export is
+        compared by content. The check runs in the background at most every
+        ``index_check_interval`` seconds; the next request rebuilds the
+        retriever, re-exporting first.
+        """
+        if self.retriever_kind != "numpy" or self.index_check_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._index_checked < self.index_check_interval or not self._index_checking.acquire(blocking=False):
+            return
+        self._index_checked = now
+
+        def check():
+            from utils.vector_index import collection_fingerprint
+            try:
+                retriever = self.peek("retriever")
+                vectorstore = self.peek("vectorstore")
+                if retriever is None or vectorstore is None:
+                    return
+                index = retriever.vector if isinstance(retriever, HybridRetriever) else retriever
+                if index.fingerprint == collection_fingerprint(vectorstore._collection):
+                    return
+                with self._lock:
+                    if self._components.get("retriever") is retriever:
+                        self._components.pop("retriever", None)
+                        # The preloaded copies are just as stale
+                        self._shared = {}
+            except Exception as e:
+                print(f"Error: {str(e)}")
+            finally:
+                self._index_checking.release()
+
+        threading.Thread(target=check, name="index-check", daemon=True).start()
+
+    def _build_client(self):
+        # The router keeps one HTTP connection pool per Ollama host alive
+        return OllamaRouter(self.ollama_hosts, **self.ollama_routing)
+
+    def get(self, name):
+        component = self._components.get(name)
+        if component is not None:
+            return component
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                component = self._builders[name]()
+                self._components[name] = component
+            return component
+
+    def peek(self, name):
+        """Return a component only if it has already been built."""
+        return self._components.get(name)
+
+    @property
+    def embeddings(self):
+        return self.get("embeddings")
+
+    @property
+    def vectorstore(self):
+        return self.get("vectorstore")
+
+    @property
+    def retriever(self):
+        return self.get("retriever")
+
+    @property
+    def client(self):
+        return self.get("client")
+
+    def index_chunks(self, chunks):
+        """``ingest`` on_batch hook: add freshly written chunks to the lexical index."""
+        retriever = self.peek("retriever")
+        if isinstance(retriever, HybridRetriever):
+            retriever.lexical.add(chunks)
+
+    def invalidate(self, *names):
+        with self._lock:
+            dropped = [self._components.pop(name, None) for name in names]
+        # Release what a dropped component holds open (the embedding cache's database)
+        for component in dropped:
+            if hasattr(component, "close"):
+                component.close()
+
+    @contextmanager
+    def using(self, *names, ignore=()):
+        """Drop the named components if the wrapped block raises anything but ``ignore``."""
+        try:
+            yield
+        except ignore:
+            raise
+        except Exception:
+            self.invalidate(*names)
+            raise
+
+    def preload(self):
+        """Load the NumPy index and the BM25 index into this process.
+
+        Retrievers built later, here or in a forked worker, reuse them instead
+        of reading the collection again. Chroma's native client does not work
+        in a child forked after it was used, so the collection is exported by
+        a short-lived spawned process and only the export is read here.
+        """
+        from utils.vector_index import NumpyIndex
+        name = self.live_collection()
+        directory = self._index_directory(name)
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            pool.apply(export_index, (self.persist_directory, name, directory, self.index_dtype,
+                                      self.index_quantization))
+        index = NumpyIndex(directory, rerank=self.index_rerank)
+        with self._lock:
+            self._shared = {"collection": name}
+            if self.retriever_kind == "numpy":
+                self._shared["index"] = index
+            if self.hybrid is not None:
+                lexical = BM25Index()
+                lexical.add(zip(index.ids, index.documents, index.metadatas))
+                self._shared["lexical"] = lexical
+
+    def sync(self):
+        """Switch to a newly activated knowledge version; returns True on a swap.
+
+        Requests already holding the old retriever finish on the old version.
+        Also starts the periodic check of the NumPy export.
+        """
+        self._check_index()
+        if self.versions is None or self.serving is None:
+            return False
+        live = self.versions.active()
+        if live == self.serving:
+            return False
+        with self._lock:
+            previous = self.serving
+            if live == previous:
+                return False
+            self._components.pop("retriever", None)
+            self._components.pop("vectorstore", None)
+            self.serving = None
+        for listener in self.swap_listeners:
+            listener(previous, live)
+        return True
+
+    def _after_fork(self):
+        self._lock = threading.RLock()
+        self._index_checking = threading.Lock()
+        self._components = {}
+
+    def check(self):
+        """Build every component and make one cheap call through each."""
+        # The router ejects and readmits failing hosts itself, so it is never rebuilt
+        self.client.list()
+        with self.using("vectorstore"):
+            self.embeddings.embed_query("ping")
+            self.vectorstore._collection.count()
+
+
+__all__ = ['ComponentPool']
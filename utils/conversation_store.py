@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session_id ON messages (session_id, id);
+CREATE INDEX IF NOT EXISTS messages_session_created ON messages (session_id, created_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    cleared_upto INTEGER NOT NULL DEFAULT 0,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_upto INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage}
+
+
+class SQLiteConversationStore:
+    """Durable conversation log in SQLite, shared by every thread and process.
+
+    Messages are only ever appended. Clearing a session records the last
+    message id it covered instead of deleting rows, and the running summary
+    used by HistoryWindow is kept the same way. Reads fetch just the turns
+    they need through the (session_id, id) index. Has the same interface as
+    SessionMemoryStore, plus ``page`` for paginated history.
+    """
+
+    def __init__(self, path, max_turns=50):
+        self.path = path
+        self.max_turns = max_turns
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.appends = 0
+        self.reads = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        # SQLite connections must not cross a fork; a forked worker opens its own
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _floor(self, db, session_id, column="cleared_upto"):
+        row = db.execute(f"SELECT {column} FROM sessions WHERE session_id = ?",
+                         (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _messages(rows):
+        return [MESSAGE_TYPES[role](content=content) for role, content in rows]
+
+    def history(self, session_id, limit=None):
+        """Return the newest ``limit`` messages (default max_turns turns), oldest first."""
+        self._count("reads")
+        db = self._connection()
+        rows = db.execute(
+            "SELECT role, content FROM (SELECT id, role, content FROM messages "
+            "WHERE session_id = ? AND id > ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+            (session_id, self._floor(db, session_id), limit or 2 * self.max_turns)).fetchall()
+        return self._messages(rows)
+
+    def save(self, session_id, user_input, output):
+        self._count("appends")
+        now = time.time()
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, "human", user_input, now), (session_id, "ai", output, now)])
+
+    def clear(self, session_id):
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            upto = db.execute("SELECT COALESCE(MAX(id), 0) FROM messages WHERE session_id = ?",
+                              (session_id,)).fetchone()[0]
+            db.execute(
+                "INSERT INTO sessions (session_id, cleared_upto, summary, summarized_upto) "
+                "VALUES (?, ?, '', ?) ON CONFLICT (session_id) DO UPDATE SET "
+                "cleared_upto = excluded.cleared_upto, summary = '', "
+                "summarized_upto = excluded.summarized_upto",
+                (session_id, upto, upto))
+
+    def summary(self, session_id):
+        """Return the running summary and the messages it does not cover yet."""
+        return self.snapshot(session_id)[1:]
+
+    def snapshot(self, session_id):
+        """Return ``summary`` plus a mark for ``fold``: the id its messages follow."""
+        self._count("reads")
+        db = self._connection()
+        with db:
+            db.execute("BEGIN")
+            row = db.execute("SELECT summary, MAX(cleared_upto, summarized_upto) FROM sessions "
+                             "WHERE session_id = ?", (session_id,)).fetchone()
+            summary, floor = row if row else ("", 0)
+            rows = db.execute("SELECT role, content FROM messages WHERE session_id = ? AND id > ? "
+                              "ORDER BY id", (session_id, floor)).fetchall()
+        return floor, summary, self._messages(rows)
+
+    def fold(self, session_id, mark, count, summary):
+        """Mark the oldest ``count`` uncovered messages as covered by ``summary``.
+
+        Does nothing if the session was cleared or folded since ``snapshot``
+        returned ``mark``.
+        """
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT MAX(cleared_upto, summarized_upto) FROM sessions "
+                             "WHERE session_id = ?", (session_id,)).fetchone()
+            floor = row[0] if row else 0
+            if floor != mark:
+                return
+            upto = db.execute("SELECT id FROM messages WHERE session_id = ? AND id > ? "
+                              "ORDER BY id LIMIT 1 OFFSET ?", (session_id, floor, count - 1)).fetchone()
+            if upto is None:
+                return
+            db.execute(
+                "INSERT INTO sessions (session_id, summary, summarized_upto) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET summary = excluded.summary, "
+                "summarized_upto = excluded.summarized_upto",
+                (session_id, summary, upto[0]))
+
+    def page(self, session_id, before=None, limit=50):
+        """Return up to ``limit`` messages older than id ``before``, newest page first.
+
+        Messages inside the page are oldest first. ``next_before`` is the
+        cursor for the next older page, or None when there are no more.
+        """
+        self._count("reads")
+        db = self._connection()
+        rows = db.execute(
+            "SELECT id, role, content, created_at FROM messages "
+            "WHERE session_id = ? AND id > ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (session_id, self._floor(db, session_id),
+             before if before is not None else 2 ** 63 - 1, limit + 1)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        return {
+            "messages": [{"id": id, "role": role, "content": content, "created_at": created_at}
+                         for id, role, content, created_at in rows],
+            "next_before": rows[0][0] if more and rows else None,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"appends": self.appends, "reads": self.reads}
+
+
+__all__ = ['SQLiteConversationStore']
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+_CLOSE = object()
+
+
+class BatchingEmbeddings(Embeddings):
+    """Coalesce concurrent small embedding calls into batched ones.
+
+    Each text is queued with a future. A dispatcher thread collects texts
+    for up to ``window`` seconds or ``max_batch`` items, whichever comes
+    first, sends them as one ``embed_documents`` call and hands every
+    caller its own vector. Calls with ``max_batch`` or more texts skip the
+    queue. ``close`` stops the dispatcher and its executor once the queued
+    texts are sent; calls after that go straight to ``inner``.
+    """
+
+    def __init__(self, inner, window=0.005, max_batch=32, max_inflight=2):
+        self.inner = inner
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight,
+                                            thread_name_prefix="embed-batch")
+        self.batches = 0
+        self.items = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self.batch_sizes = {}
+
+    def _start(self):
+        # Called with the lock held
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(
+                target=self._run, name="embed-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _run(self):
+        closing = False
+        while not closing:
+            item = self._queue.get()
+            if item is _CLOSE:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+            self._record(batch)
+            self._executor.submit(self._embed, batch)
+        self._executor.shutdown(wait=False)
+
+    def _record(self, batch):
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for _, _, queued in batch:
+                delay = now - queued
+                self.queue_delay_total += delay
+                self.queue_delay_max = max(self.queue_delay_max, delay)
+
+    def _embed(self, batch):
+        try:
+            vectors = list(self.inner.embed_documents([text for text, _, _ in batch]))
+            # With a vector missing there is no telling which text it belonged to
+            if len(vectors) != len(batch):
+                raise ValueError(f"Embedding model returned {len(vectors)} vectors for {len(batch)} texts")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def embed_documents(self, texts):
+        if len(texts) >= self.max_batch:
+            return self.inner.embed_documents(texts)
+        futures = []
+        with self._lock:
+            if self._closed:
+                return self.inner.embed_documents(texts)
+            self._start()
+            for text in texts:
+                future = Future()
+                self._queue.put((text, future, time.monotonic()))
+                futures.append(future)
+        return [future.result() for future in futures]
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._dispatcher is None:
+                self._executor.shutdown(wait=False)
+            else:
+                self._queue.put(_CLOSE)
+        if hasattr(self.inner, "close"):
+            self.inner.close()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_fill": self.items / (self.batches * self.max_batch) if self.batches else 0.0,
+                "mean_queue_delay_ms": 1000 * self.queue_delay_total / self.items if self.items else 0.0,
+                "max_queue_delay_ms": 1000 * self.queue_delay_max,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
+
+
+__all__ = ['BatchingEmbeddings']
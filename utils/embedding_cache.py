@@ -0,0 +1,164 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize(text):
+    """Cache key form of a text: collapsed whitespace, case-folded."""
+    return " ".join(text.split()).casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """Two-tier cache in front of an embedding model.
+
+    The first tier is an in-process LRU of ``memory_items`` vectors. The
+    second is a SQLite file holding up to ``disk_items`` vectors, so warm
+    entries survive restarts. Keys combine the model name with the
+    normalized text, and the disk tier is emptied when it was written by a
+    different model.
+    """
+
+    def __init__(self, inner, model, path, memory_items=4096, disk_items=100_000):
+        self.inner = inner
+        self.model = model
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'model'").fetchone()
+        if row is None or row[0] != model:
+            self._db.execute("DELETE FROM embeddings")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('model', ?)", (model,))
+        self._db.commit()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model}\0{normalize(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys):
+        """Fill what the tiers know; return {key: vector} for the hits."""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    found[key] = vector
+                elif key not in missing:
+                    missing.append(key)
+            if not missing or self._db is None:
+                return found
+
+            placeholders = ",".join("?" * len(missing))
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                missing).fetchall()
+            if rows:
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(time.time(), key) for key, _ in rows])
+                self._db.commit()
+            for key, blob in rows:
+                vector = array("f", blob).tolist()
+                self._remember(key, vector)
+                self.disk_hits += 1
+                found[key] = vector
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._db is None:
+                return
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items])
+            self._writes += len(items)
+            # Trim the disk tier every so often rather than on every write
+            if self._writes >= max(1, self.disk_items // 100):
+                self._writes = 0
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.disk_items,))
+            self._db.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        if pending:
+            with self._lock:
+                self.misses += len(pending)
+            vectors = self.inner.embed_documents(list(pending.values()))
+            fresh = list(zip(pending, vectors))
+            self._store(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def close(self):
+        """Close the disk tier (calls still in flight skip it) and the wrapped model."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        if hasattr(self.inner, "close"):
+            self.inner.close()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_items": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+__all__ = ['CachedEmbeddings', 'normalize']
@@ -1,16 +1,30 @@
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-import chromadb  
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.ingest import content_hash, ingest
 
-# initialize chromaDB 
-embedding_function = OllamaEmbeddings(model="nomic-embed-text")  
+# embedding_function and vectorstore are built on first access (see __getattr__),
+# so importing this module neither contacts Ollama nor touches the database.
+# Both come from the app's component pool, so they use the same database
+# directory (SOULSPACE_DATABASE), embedding cache and live knowledge version
+def _build_embedding_function():
+    from utils import rag
+    return rag.components.embeddings
 
-# collection using LangChain's Chroma wrapper
-vectorstore = Chroma(
-    collection_name="therapy_knowledge",
-    embedding_function=embedding_function,
-    persist_directory="database"
-)
+# collection using LangChain's Chroma wrapper, on the live knowledge version
+def _build_vectorstore():
+    from utils import rag
+    return rag.components.vectorstore
+
+_builders = {"embedding_function": _build_embedding_function, "vectorstore": _build_vectorstore}
+
+def __getattr__(name):
+    if name in globals():
+        return globals()[name]
+    if name not in _builders:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = _builders[name]()
+    return globals()[name]
 
 #therapy techniques
 techniques = [
@@ -21,15 +35,20 @@ techniques = [
     "Brief meditation: Focus on your breath for 3 minutes while acknowledging and releasing thoughts"
 ]
 
-#Add doc
-vectorstore.add_texts(
-    texts=techniques,
-    ids=[f"doc_{i}" for i in range(1, 6)]
-)
+def seed():
+    """Add the built-in techniques as doc_1..doc_5, skipping any already stored"""
+    chunks = [
+        (f"doc_{i}", text, {"source": "techniques", "content_hash": content_hash(text), "chunk": 0})
+        for i, text in enumerate(techniques, 1)
+    ]
+    return ingest(chunks, __getattr__("vectorstore"), __getattr__("embedding_function"))
 
-#Test query using LangChain
-results = vectorstore.similarity_search("anxiety", k=1)
-print([doc.page_content for doc in results])
+if __name__ == "__main__":
+    print(seed().report())
+    
+    #Test query using LangChain
+    results = __getattr__("vectorstore").similarity_search("anxiety", k=1)
+    print([doc.page_content for doc in results])
 
 # Export components (modified for LangChain)
-__all__ = ['vectorstore', 'embedding_function']
\ No newline at end of file
+__all__ = ['vectorstore', 'embedding_function', 'techniques', 'seed']
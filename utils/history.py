@@ -0,0 +1,101 @@
+import queue
+import threading
+
+ROLE_LABELS = {"human": "Client", "ai": "Therapist"}
+
+
+def estimate_tokens(text):
+    """Cheap token estimate, roughly four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def format_message(msg):
+    return f"{ROLE_LABELS.get(msg.type, msg.type)}: {msg.content}"
+
+
+class HistoryWindow:
+    """Token-budgeted view of a session's conversation.
+
+    The last ``recent_turns`` exchanges are kept verbatim and everything older
+    is folded into a running summary. A turn is saved as soon as it is
+    recorded, so the next prompt always has it; updating the summary, a
+    model call, happens on a background worker after the reply has been
+    returned.
+    """
+
+    def __init__(self, store, summarize, recent_turns=4, token_budget=1024):
+        self.store = store
+        self.summarize = summarize
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self._tasks = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def window(self, session_id):
+        """Return the summary and the verbatim messages that fit the token budget."""
+        summary, messages = self.store.summary(session_id)
+        messages = messages[-2 * self.recent_turns:]
+        used = sum(estimate_tokens(format_message(msg)) for msg in messages)
+        if summary:
+            used += estimate_tokens(summary)
+
+        # Over budget: drop the oldest verbatim messages, then shorten the summary
+        while messages and used > self.token_budget:
+            used -= estimate_tokens(format_message(messages.pop(0)))
+        if summary and used > self.token_budget:
+            summary = summary[-4 * self.token_budget:]
+        return summary, messages
+
+    def render(self, session_id):
+        summary, messages = self.window(session_id)
+        lines = [format_message(msg) for msg in messages]
+        if summary:
+            lines.insert(0, f"Summary of earlier conversation: {summary}")
+        return "\n".join(lines)
+
+    def record(self, session_id, user_input, output):
+        """Save a finished turn and queue a summary update for its session."""
+        self.store.save(session_id, user_input, output)
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._submit(self._fold, session_id)
+
+    def join(self):
+        """Block until every queued summary update has run."""
+        self._tasks.join()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="history-summarizer", daemon=True)
+                self._worker.start()
+        self._tasks.put((fn, args))
+
+    def _run(self):
+        while True:
+            fn, args = self._tasks.get()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error: {str(e)}")
+            finally:
+                self._tasks.task_done()
+
+    def _fold(self, session_id):
+        with self._lock:
+            self._pending.discard(session_id)
+        mark, summary, messages = self.store.snapshot(session_id)
+        count = len(messages) - 2 * self.recent_turns
+        if count <= 0:
+            return
+        older = [format_message(msg) for msg in messages[:count]]
+        # Dropped by the store if the session was cleared while summarizing
+        self.store.fold(session_id, mark, count, self.summarize(summary, older))
+
+
+__all__ = ['HistoryWindow', 'estimate_tokens', 'format_message']
@@ -0,0 +1,227 @@
+"""Load text, Markdown or JSONL files into the therapy_knowledge collection.
+
+    python -m utils.ingest knowledge/ extra.jsonl --batch-size 64 --workers 4
+
+Files are streamed and split into chunks. Each chunk is identified by its
+document (the record's id, or else its file and line) and its position in
+it, and carries a hash of its content, so chunks already stored unchanged
+are skipped and re-running an ingest is cheap. New and changed chunks are
+embedded in batches on a worker pool and written to the collection in bulk;
+chunks of an ingested document that it no longer has are deleted.
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+TEXT_SUFFIXES = {".txt", ".md", ".markdown"}
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_files(paths):
+    for path in map(Path, paths):
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.suffix.lower() in TEXT_SUFFIXES | JSONL_SUFFIXES:
+                    yield child
+        else:
+            yield path
+
+
+def iter_records(paths):
+    """Yield ``(text, metadata, id)`` for each source document; id is None for text files."""
+    for path in iter_files(paths):
+        if path.suffix.lower() in JSONL_SUFFIXES:
+            with open(path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    text = record.pop("text", None) or record.pop("page_content", "")
+                    # Records without an id are known by their line
+                    doc_id = record.pop("id", None) or f"{path}:{line_number}"
+                    metadata = {
+                        key: value for key, value in record.items()
+                        if isinstance(value, (str, int, float, bool))
+                    }
+                    metadata.setdefault("source", f"{path}:{line_number}")
+                    yield text, metadata, doc_id
+        else:
+            yield path.read_text(encoding="utf-8"), {"source": str(path)}, None
+
+
+def split_long(paragraph, chunk_size):
+    piece = ""
+    for sentence in SENTENCE_END.split(paragraph):
+        while len(sentence) > chunk_size:
+            if piece:
+                yield piece
+                piece = ""
+            yield sentence[:chunk_size]
+            sentence = sentence[chunk_size:]
+        if piece and len(piece) + 1 + len(sentence) > chunk_size:
+            yield piece
+            piece = ""
+        piece = f"{piece} {sentence}" if piece else sentence
+    if piece:
+        yield piece
+
+
+def chunk_text(text, chunk_size=1000):
+    """Pack blank-line separated paragraphs into chunks of at most chunk_size characters."""
+    chunk = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        for piece in split_long(paragraph, chunk_size):
+            if chunk and len(chunk) + 2 + len(piece) > chunk_size:
+                yield chunk
+                chunk = ""
+            chunk = f"{chunk}\n\n{piece}" if chunk else piece
+    if chunk:
+        yield chunk
+
+
+def iter_chunks(records, chunk_size=1000):
+    """Yield ``(id, text, metadata)`` chunks ready to embed.
+
+    Ids come from the document and the chunk's position, so an edited
+    document replaces its chunks instead of adding to them. Text files
+    without an id are known by their source path.
+    """
+    for text, metadata, doc_id in records:
+        document = str(doc_id if doc_id is not None else metadata["source"])
+        pieces = list(chunk_text(text, chunk_size))
+        for index, piece in enumerate(pieces):
+            chunk_id = document if len(pieces) == 1 else f"{document}#{index}"
+            yield chunk_id, piece, dict(metadata, document=document, content_hash=content_hash(piece),
+                                        chunk=index)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class IngestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.documents = 0
+        self.chunks = 0
+        self.skipped = 0
+        self.embedded = 0
+        self.removed = 0
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (f"{self.documents} documents, {self.chunks} chunks in {elapsed:.1f}s: "
+                f"{self.embedded} embedded, {self.skipped} unchanged, {self.removed} removed; "
+                f"{self.documents / elapsed:.1f} docs/s, {self.embedded / elapsed:.1f} embeddings/s")
+
+
+def remove_stale(collection, documents, batch_size=64):
+    """Delete stored chunks of ``documents`` (document -> ids of its chunks now) not in it.
+
+    Chunks stored before they carried their document are matched by source.
+    Returns how many were deleted.
+    """
+    removed = 0
+    for keys in batched(documents, batch_size):
+        stored = collection.get(where={"$or": [{"document": {"$in": keys}}, {"source": {"$in": keys}}]},
+                                include=["metadatas"])
+        stale = []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            metadata = metadata or {}
+            if chunk_id not in documents.get(metadata.get("document") or metadata.get("source"), ()):
+                stale.append(chunk_id)
+        if stale:
+            collection.delete(ids=stale)
+            removed += len(stale)
+    return removed
+
+
+def ingest(chunks, vectorstore, embedding_function, batch_size=64, workers=4, on_batch=None):
+    """Embed and upsert new or changed chunks, delete stale ones; return IngestStats."""
+    collection = vectorstore._collection
+    stats = IngestStats()
+    # Document -> ids of its chunks, for chunks that name their document
+    documents = {}
+
+    def changed(batch):
+        # Upserts reject repeated ids, so keep the first copy of each chunk
+        seen = set()
+        batch = [chunk for chunk in batch if not (chunk[0] in seen or seen.add(chunk[0]))]
+        stats.documents += sum(1 for _, _, metadata in batch if metadata["chunk"] == 0)
+        stats.chunks += len(batch)
+        for chunk_id, _, metadata in batch:
+            if "document" in metadata:
+                documents.setdefault(metadata["document"], set()).add(chunk_id)
+        known = collection.get(ids=[chunk_id for chunk_id, _, _ in batch], include=["metadatas"])
+        stored = {
+            chunk_id: (metadata or {}).get("content_hash")
+            for chunk_id, metadata in zip(known["ids"], known["metadatas"])
+        }
+        fresh = [chunk for chunk in batch if stored.get(chunk[0]) != chunk[2]["content_hash"]]
+        stats.skipped += len(batch) - len(fresh)
+        return fresh
+
+    def embed(batch):
+        return batch, embedding_function.embed_documents([text for _, text, _ in batch])
+
+    def write(future):
+        batch, vectors = future.result()
+        collection.upsert(
+            ids=[chunk_id for chunk_id, _, _ in batch],
+            embeddings=vectors,
+            documents=[text for _, text, _ in batch],
+            metadatas=[metadata for _, _, metadata in batch]
+        )
+        stats.embedded += len(batch)
+        if on_batch is not None:
+            on_batch(batch)
+
+    # Keep a bounded number of batches in flight so large corpora stream through
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        for batch in batched(chunks, batch_size):
+            fresh = changed(batch)
+            if not fresh:
+                continue
+            pending.append(pool.submit(embed, fresh))
+            if len(pending) >= 2 * workers:
+                write(pending.pop(0))
+        for future in pending:
+            write(future)
+    stats.removed = remove_stale(collection, documents, batch_size)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load documents into the therapy_knowledge collection.")
+    parser.add_argument("paths", nargs="+", help="files or directories of .txt, .md or .jsonl")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per embedding call")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent embedding calls")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="maximum characters per chunk")
+    args = parser.parse_args(argv)
+
+    from utils.embeddings import vectorstore, embedding_function
+    chunks = iter_chunks(iter_records(args.paths), args.chunk_size)
+    stats = ingest(chunks, vectorstore, embedding_function, args.batch_size, args.workers)
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Versioned knowledge-base collections with blue-green swaps.
+
+    python -m utils.knowledge_versions build knowledge/ extra.jsonl --probes probes.jsonl
+    python -m utils.knowledge_versions list
+    python -m utils.knowledge_versions rollback
+
+``build`` loads the files into a fresh ``therapy_knowledge_vN`` collection
+while the live one keeps serving, checks the new version's recall and, if
+it passes, makes it live by replacing a small pointer file. Running
+processes notice the new pointer within KNOWLEDGE_CHECK_INTERVAL seconds
+and rebuild their retriever on it; requests already running finish on the
+old version. ``rollback`` makes the previous version live again, and
+``drop`` deletes a version that is neither live nor the rollback target.
+
+Probe files are JSONL with a ``query`` and the chunk ``ids`` it should
+find. Without one, a sample of the live version's chunks is queried with
+its own text and must be found in the new version about as often as in the
+live one, so a build that drops documents is not made live; build it with
+--no-activate and ``activate`` it by hand if that is intended. The first
+build, with nothing live yet, probes with its own chunks.
+"""
+import argparse
+import fcntl
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.ingest import ingest, iter_chunks, iter_records
+
+
+class KnowledgeVersions:
+    """Pointer file naming the live version of the knowledge collection.
+
+    The file lists every built version with its build report and names the
+    ``active`` one and the ``previous`` one kept for rollback. It is only
+    ever replaced whole (write, then rename), so a reader sees the old or
+    the new pointer and nothing in between. Without the file the
+    unversioned ``base_name`` collection is live, as before versioning.
+    """
+
+    def __init__(self, path, base_name, check_interval=5, clock=time.monotonic):
+        self.path = Path(path)
+        self.base_name = base_name
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._checked = None
+        self._stamp = None
+        self._active = base_name
+
+    def state(self):
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {"active": self.base_name, "previous": None, "versions": {}}
+
+    def active(self):
+        """Name of the live collection; the file is checked at most every check_interval seconds."""
+        now = self._clock()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return self._active
+        with self._lock:
+            self._checked = now
+            try:
+                stat = self.path.stat()
+                stamp = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                stamp = None
+            if stamp != self._stamp:
+                self._stamp = stamp
+                self._active = self.state()["active"]
+            return self._active
+
+    def reserve(self):
+        """Claim the next version name, so concurrent builds never share one."""
+        with self._update() as state:
+            numbers = [int(name.rsplit("_v", 1)[1]) for name in state["versions"]]
+            name = f"{self.base_name}_v{max(numbers, default=0) + 1}"
+            state["versions"][name] = {"started_at": time.time()}
+        return name
+
+    @contextmanager
+    def _update(self):
+        # One writer at a time across processes; readers never wait
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.state()
+            yield state
+            temporary = self.path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(state, indent=2))
+            os.replace(temporary, self.path)
+        self._checked = None
+
+    def record(self, name, report):
+        """Store a built version's report without making it live."""
+        with self._update() as state:
+            state["versions"][name].update(report)
+
+    def activate(self, name):
+        with self._update() as state:
+            if name != state["active"]:
+                if name != self.base_name and name not in state["versions"]:
+                    raise ValueError(f"Unknown knowledge version {name}")
+                state["previous"], state["active"] = state["active"], name
+                if name in state["versions"]:
+                    state["versions"][name]["activated_at"] = time.time()
+
+    def rollback(self):
+        """Make the previous version live again; returns its name."""
+        with self._update() as state:
+            if not state["previous"]:
+                raise ValueError("No previous knowledge version to roll back to")
+            state["previous"], state["active"] = state["active"], state["previous"]
+            return state["active"]
+
+    def forget(self, name):
+        with self._update() as state:
+            if name in (state["active"], state["previous"]):
+                raise ValueError(f"{name} is live or the rollback target")
+            state["versions"].pop(name, None)
+
+
+def self_probes(collection, sample=50, seed=0):
+    """Probe with stored chunks themselves: each chunk's text should find its id or its content."""
+    ids = collection.get(include=[])["ids"]
+    chosen = random.Random(seed).sample(ids, min(sample, len(ids)))
+    if not chosen:
+        return []
+    data = collection.get(ids=chosen, include=["documents", "metadatas"])
+    return [
+        (text, {chunk_id, (metadata or {}).get("content_hash")} - {None})
+        for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+    ]
+
+
+def load_probes(path):
+    probes = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                probes.append((record["query"], set(record["ids"])))
+    return probes
+
+
+def recall_at_k(vectorstore, probes, k=3):
+    """Share of ``(query, expected ids)`` probes with an expected id in the top k.
+
+    A chunk's content_hash counts as its id too, so the same text stored
+    under another id is still found.
+    """
+    if not probes:
+        return 0.0
+    hits = 0
+    for query, expected in probes:
+        hits += any(doc.id in expected or doc.metadata.get("content_hash") in expected
+                    for doc in vectorstore.similarity_search(query, k=k))
+    return hits / len(probes)
+
+
+def build_version(pool, versions, chunks, probes=None, min_recall=0.9, max_regression=0.05, k=3,
+                  batch_size=64, workers=4):
+    """Ingest ``chunks`` into a new version and validate it; the live version is untouched.
+
+    Returns the version name, its report and whether it passed: the new
+    version must hold chunks, reach ``min_recall`` and be at most
+    ``max_regression`` below the live version's recall. Without ``probes``
+    a sample of the live version's chunks is used, or of the new version's
+    when nothing is live yet.
+    """
+    name = versions.reserve()
+    vectorstore = pool.open_collection(name)
+    stats = ingest(chunks, vectorstore, pool.embeddings, batch_size, workers)
+    count = vectorstore._collection.count()
+
+    live_recall = None
+    live = pool.open_collection(versions.active())
+    if not probes:
+        probes = self_probes(live._collection)
+    if probes:
+        live_recall = recall_at_k(live, probes, k)
+    else:
+        # Nothing is live yet: the new chunks must at least find themselves
+        probes = self_probes(vectorstore._collection)
+    recall = recall_at_k(vectorstore, probes, k)
+
+    passed = count > 0 and recall >= min_recall
+    if live_recall is not None:
+        passed = passed and recall >= live_recall - max_regression
+    report = {
+        "built_at": time.time(),
+        "chunks": count,
+        "embedded": stats.embedded,
+        "probes": len(probes),
+        f"recall_at_{k}": recall,
+        f"live_recall_at_{k}": live_recall,
+        "passed": passed,
+    }
+    versions.record(name, report)
+    return name, report, passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build, switch and roll back knowledge-base versions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="load files into a new version and make it live if it passes")
+    build.add_argument("paths", nargs="+", help="files or directories of .txt, .md or .jsonl")
+    build.add_argument("--probes", help="JSONL of {query, ids} recall probes")
+    build.add_argument("--min-recall", type=float, default=0.9)
+    build.add_argument("--max-regression", type=float, default=0.05,
+                       help="allowed recall drop against the live version")
+    build.add_argument("--k", type=int, default=3)
+    build.add_argument("--no-activate", action="store_true", help="validate only; activate later")
+    build.add_argument("--batch-size", type=int, default=64, help="chunks per embedding call")
+    build.add_argument("--workers", type=int, default=4, help="concurrent embedding calls")
+    build.add_argument("--chunk-size", type=int, default=1000, help="maximum characters per chunk")
+    commands.add_parser("list", help="show every version and which one is live")
+    activate = commands.add_parser("activate", help="make a built version live")
+    activate.add_argument("name")
+    commands.add_parser("rollback", help="make the previous version live again")
+    drop = commands.add_parser("drop", help="delete a version that is not live or the rollback target")
+    drop.add_argument("name")
+    args = parser.parse_args(argv)
+
+    from utils import rag
+    versions = rag.knowledge_versions
+
+    if args.command == "build":
+        probes = load_probes(args.probes) if args.probes else None
+        chunks = iter_chunks(iter_records(args.paths), args.chunk_size)
+        name, report, passed = build_version(
+            rag.components, versions, chunks, probes, args.min_recall, args.max_regression, args.k,
+            args.batch_size, args.workers)
+        print(f"{name}: {json.dumps(report)}")
+        if not passed:
+            sys.exit(f"{name} failed validation; {versions.active()} stays live")
+        if not args.no_activate:
+            versions.activate(name)
+            print(f"{name} is live")
+    elif args.command == "list":
+        state = versions.state()
+        for name, report in sorted(state["versions"].items()):
+            marker = "live" if name == state["active"] else "previous" if name == state["previous"] else ""
+            print(f"{name:<28} {marker:<8} {json.dumps(report)}")
+        if state["active"] not in state["versions"]:
+            print(f"{state['active']:<28} live")
+    elif args.command == "activate":
+        versions.activate(args.name)
+        print(f"{args.name} is live")
+    elif args.command == "rollback":
+        print(f"{versions.rollback()} is live")
+    elif args.command == "drop":
+        versions.forget(args.name)
+        rag.components.drop_collection(args.name)
+        print(f"Dropped {args.name}")
+
+
+__all__ = ['KnowledgeVersions', 'build_version', 'recall_at_k', 'self_probes', 'load_probes']
+
+
+if __name__ == "__main__":
+    main()
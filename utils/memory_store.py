@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Session:
+    __slots__ = ("memory", "summary", "last_access", "size", "first_id")
+
+    def __init__(self, now):
+        # Imported here: langchain.memory is slow to import and only needed once a session exists
+        from langchain.memory import ConversationBufferMemory
+        self.memory = ConversationBufferMemory(
+            memory_key="chat_history",
+            return_messages=True
+        )
+        self.summary = ""
+        self.last_access = now
+        self.size = 0
+        # Id of the oldest message still held; ids stay fixed as older ones are dropped
+        self.first_id = 1
+
+    def resize(self):
+        messages = self.memory.chat_memory.messages
+        size = len(self.summary.encode("utf-8"))
+        size += sum(len(msg.content.encode("utf-8")) for msg in messages)
+        delta = size - self.size
+        self.size = size
+        return delta
+
+
+class SessionMemoryStore:
+    """Bounded, per-session conversation memory.
+
+    Sessions are kept in least-recently-used order. A session is evicted when
+    it has been idle for longer than ``idle_ttl`` seconds, or when the store
+    holds more than ``max_sessions`` sessions or ``max_bytes`` of message text.
+    Each session keeps at most ``max_turns`` exchanges.
+    """
+
+    def __init__(self, max_sessions=1000, idle_ttl=1800, max_turns=50,
+                 max_bytes=64 * 1024 * 1024, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, session_id):
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry.size
+
+    def _expire(self, now):
+        # Oldest access is always first, so stop at the first live session
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry.last_access <= self.idle_ttl:
+                break
+            self._drop(session_id)
+            self.expirations += 1
+
+    def _evict(self, keep):
+        while len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def _entry(self, session_id):
+        now = self._clock()
+        self._expire(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            self.misses += 1
+            entry = self._sessions[session_id] = _Session(now)
+            self._evict(keep=session_id)
+        else:
+            self.hits += 1
+            self._sessions.move_to_end(session_id)
+            entry.last_access = now
+        return entry
+
+    def history(self, session_id):
+        with self._lock:
+            memory = self._entry(session_id).memory
+        return memory.load_memory_variables({})["chat_history"]
+
+    def save(self, session_id, user_input, output):
+        with self._lock:
+            entry = self._entry(session_id)
+            entry.memory.save_context({"input": user_input}, {"output": output})
+            messages = entry.memory.chat_memory.messages
+            if len(messages) > 2 * self.max_turns:
+                dropped = len(messages) - 2 * self.max_turns
+                del messages[:dropped]
+                entry.first_id += dropped
+            self._bytes += entry.resize()
+            self._evict(keep=session_id)
+
+    def summary(self, session_id):
+        """Return the running summary and the messages it does not cover yet."""
+        return self.snapshot(session_id)[1:]
+
+    def snapshot(self, session_id):
+        """Return ``summary`` plus a mark for ``fold`` of where its messages start."""
+        with self._lock:
+            entry = self._entry(session_id)
+            return (entry, entry.first_id), entry.summary, list(entry.memory.chat_memory.messages)
+
+    def fold(self, session_id, mark, count, summary):
+        """Replace the oldest ``count`` messages of a session with ``summary``.
+
+        Does nothing if the session was cleared or its oldest messages
+        changed since ``snapshot`` returned ``mark``.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or (entry, entry.first_id) != mark:
+                return
+            del entry.memory.chat_memory.messages[:count]
+            entry.first_id += count
+            entry.summary = summary
+            self._bytes += entry.resize()
+
+    def clear(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def page(self, session_id, before=None, limit=50):
+        """Return up to ``limit`` messages older than id ``before``, newest page first.
+
+        Each message keeps its id while newer ones arrive and older ones are
+        trimmed, so a ``next_before`` cursor stays valid between turns.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            messages = list(entry.memory.chat_memory.messages) if entry else []
+            first_id = entry.first_id if entry else 1
+        end = len(messages) if before is None else max(0, min(before - first_id, len(messages)))
+        start = max(0, end - limit)
+        return {
+            "messages": [{"id": first_id + i, "role": msg.type, "content": msg.content, "created_at": None}
+                         for i, msg in enumerate(messages[start:end], start)],
+            "next_before": first_id + start if start > 0 else None,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+__all__ = ['SessionMemoryStore']
@@ -0,0 +1,221 @@
+"""Low-overhead request metrics rendered in the Prometheus text format.
+
+Histograms and counters are process-local and cost a lock and a bisect per
+observation, so they stay on in production. ``span`` times one stage of a
+request; ``traced`` groups the spans and notes of one request and, when
+SOULSPACE_TRACE_LOG is set, appends them to that file as a JSON line.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+TRACE_LOG = os.environ.get("SOULSPACE_TRACE_LOG")
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = _label_text(self.labelnames + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class StatsGauges:
+    """Exposes every number in a ``stats()`` dict as a gauge named prefix_key."""
+
+    def __init__(self, prefix, stats, help):
+        self.prefix = prefix
+        self.stats = stats
+        self.help = help
+
+    def render(self):
+        try:
+            stats = self.stats()
+        except Exception:
+            return []
+        lines = []
+        for key, value in (stats or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines += [f"# HELP {name} {self.help}: {key}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self.register(Histogram(name, help, buckets, labelnames))
+
+    def stats_gauges(self, prefix, stats, help):
+        return self.register(StatsGauges(prefix, stats, help))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "soulspace_stage_seconds", "Time spent in each stage of a chat request", labelnames=("stage",))
+request_seconds = registry.histogram(
+    "soulspace_request_seconds", "End-to-end chat request time", labelnames=("endpoint",))
+prompt_tokens = registry.histogram(
+    "soulspace_prompt_tokens", "Estimated prompt size sent to the model", SIZE_BUCKETS)
+history_messages = registry.histogram(
+    "soulspace_history_messages", "Conversation messages loaded per request", SIZE_BUCKETS)
+retrieved_documents = registry.histogram(
+    "soulspace_retrieved_documents", "Knowledge documents retrieved per request", SIZE_BUCKETS)
+fallback_responses = registry.counter(
+    "soulspace_fallback_responses_total", "Replies that used the canned fallback", ("reason",))
+prompt_eval_tokens = registry.histogram(
+    "soulspace_prompt_eval_tokens", "Prompt tokens Ollama evaluated (not served from its cache)",
+    SIZE_BUCKETS, ("mode",))
+time_to_first_token = registry.histogram(
+    "soulspace_time_to_first_token_seconds", "Time until the model produced its first token",
+    labelnames=("mode",))
+budget_overruns = registry.counter(
+    "soulspace_latency_budget_overruns_total", "Replies that missed LATENCY_BUDGET, by stage", ("stage",))
+retrieval_paths = registry.counter(
+    "soulspace_retrieval_path_total", "Hybrid retrievals answered lexically or by fusion", ("path",))
+queue_wait_seconds = registry.histogram(
+    "soulspace_generation_queue_wait_seconds", "Time a generation waited for a scheduler slot",
+    labelnames=("priority",))
+knowledge_swaps = registry.counter(
+    "soulspace_knowledge_swaps_total", "Switches to a newly live knowledge-base version")
+
+_trace = contextvars.ContextVar("soulspace_trace", default=None)
+_trace_lock = threading.Lock()
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            stages = trace["stages"]
+            stages[stage] = stages.get(stage, 0.0) + round(elapsed * 1000, 3)
+
+
+def note(key, value):
+    """Attach a value to the current request's trace, if one is being kept."""
+    trace = _trace.get()
+    if trace is not None:
+        trace[key] = value
+
+
+@contextmanager
+def traced(endpoint):
+    """Time one whole request and, with SOULSPACE_TRACE_LOG set, log its trace."""
+    trace = None
+    if TRACE_LOG:
+        trace = {"ts": time.time(), "endpoint": endpoint, "stages": {}}
+        _trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        request_seconds.observe(elapsed, endpoint=endpoint)
+        if trace is not None:
+            _trace.set(None)
+            trace["total_ms"] = round(elapsed * 1000, 3)
+            line = json.dumps(trace)
+            with _trace_lock, open(TRACE_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+__all__ = ['registry', 'span', 'note', 'traced', 'Counter', 'Histogram', 'StatsGauges',
+           'stage_seconds', 'request_seconds', 'prompt_tokens', 'history_messages',
+           'retrieved_documents', 'fallback_responses', 'retrieval_paths', 'prompt_eval_tokens',
+           'time_to_first_token', 'budget_overruns', 'knowledge_swaps',
+           'queue_wait_seconds']
@@ -0,0 +1,309 @@
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from ollama import AsyncClient, Client, ResponseError
+
+
+class NoHealthyHost(ConnectionError):
+    pass
+
+
+# What a failed Ollama call raises, as opposed to errors from the caller's own components
+OLLAMA_ERRORS = (ResponseError, ConnectionError, httpx.HTTPError)
+
+
+def host_failure(error):
+    """True for errors that say the host is unreachable rather than the request is bad."""
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+class _Host:
+    __slots__ = ("url", "client", "async_client", "outstanding", "generating", "requests",
+                 "failures", "ejected_until")
+
+    def __init__(self, url, client_options):
+        self.url = url
+        # One httpx connection pool per host, kept open between requests
+        self.client = Client(host=url, **client_options)
+        self.async_client = None
+        self.outstanding = 0
+        self.generating = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+
+def _health_loop(router_ref, interval):
+    # Holds only a weak reference so a discarded router's thread ends
+    while True:
+        time.sleep(interval)
+        router = router_ref()
+        if router is None:
+            return
+        router.check_health()
+        del router
+
+
+class OllamaRouter:
+    """Spreads Ollama calls over several hosts.
+
+    Each call goes to the eligible host with the fewest outstanding
+    requests, except that a session keeps returning to the host it last
+    used (so that host's model and prompt caches stay warm) unless that host
+    is more than ``sticky_slack`` requests busier than the least busy one.
+    A host that fails to answer is ejected for ``eject_seconds`` and the
+    call is retried on the next host; ejected hosts are readmitted by the
+    background health check or once their ejection expires. Streams fail
+    over only before their first chunk. With ``max_in_flight`` set, chat
+    calls go only to hosts running fewer than that many generations, and
+    ``capacity`` tells a scheduler how many may run at once.
+
+    ``chat``, ``embed`` and ``list`` take the same arguments as
+    ``ollama.Client``, plus an optional ``session_id`` for sticky routing.
+    """
+
+    def __init__(self, hosts, health_interval=10, eject_seconds=30, max_connections=32,
+                 timeout=None, sticky_sessions=10_000, sticky_slack=2, max_in_flight=None,
+                 clock=time.monotonic):
+        self.eject_seconds = eject_seconds
+        self.max_in_flight = max_in_flight
+        self.sticky_sessions = sticky_sessions
+        self.sticky_slack = sticky_slack
+        self._clock = clock
+        self._client_options = {
+            "timeout": timeout,
+            "limits": httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections),
+        }
+        self.hosts = [_Host(url.strip().rstrip("/"), self._client_options) for url in hosts]
+        if not self.hosts:
+            raise ValueError("OllamaRouter needs at least one host")
+        self._sticky = OrderedDict()  # session id -> host url
+        self._lock = threading.Lock()
+        self.failovers = 0
+        if health_interval and len(self.hosts) > 1:
+            threading.Thread(target=_health_loop, args=(weakref.ref(self), health_interval),
+                             name="ollama-health", daemon=True).start()
+
+    # Routing
+
+    def _order(self, session_id, generation=False):
+        """Hosts to try for one call, best first."""
+        now = self._clock()
+        with self._lock:
+            live = [host for host in self.hosts if host.ejected_until <= now]
+            # With every host ejected, try them all, soonest readmitted first
+            if not live:
+                return sorted(self.hosts, key=lambda host: host.ejected_until)
+            if generation and self.max_in_flight is not None:
+                # Full hosts go last; they are only tried if every other host fails
+                free = [host for host in live if host.generating < self.max_in_flight]
+                full = [host for host in live if host.generating >= self.max_in_flight]
+                return self._rank(free, session_id) + self._rank(full, session_id)
+            return self._rank(live, session_id)
+
+    def _rank(self, live, session_id):
+        # Called with the lock held
+        spread = zlib.crc32(str(session_id).encode())
+        live.sort(key=lambda host: (host.outstanding, zlib.crc32(host.url.encode()) ^ spread))
+        url = self._sticky.get(session_id) if session_id is not None else None
+        for host in live:
+            if host.url == url and host.outstanding <= live[0].outstanding + self.sticky_slack:
+                live.remove(host)
+                live.insert(0, host)
+                break
+        return live
+
+    def capacity(self):
+        """How many generations may run at once over the live hosts, or None for no limit."""
+        if self.max_in_flight is None:
+            return None
+        now = self._clock()
+        live = sum(1 for host in self.hosts if host.ejected_until <= now)
+        # With every host ejected, requests still go out to find one that answers
+        return self.max_in_flight * (live or len(self.hosts))
+
+    def _begin(self, host, generation=False):
+        with self._lock:
+            host.outstanding += 1
+            host.generating += generation
+            host.requests += 1
+
+    def _end(self, host, session_id=None, error=None, generation=False):
+        with self._lock:
+            host.outstanding -= 1
+            host.generating -= generation
+            if error is not None:
+                host.failures += 1
+                host.ejected_until = self._clock() + self.eject_seconds
+                self.failovers += 1
+            elif session_id is not None:
+                self._sticky[session_id] = host.url
+                self._sticky.move_to_end(session_id)
+                while len(self._sticky) > self.sticky_sessions:
+                    self._sticky.popitem(last=False)
+
+    def _call(self, session_id, call, generation=False):
+        error = None
+        for host in self._order(session_id, generation):
+            self._begin(host, generation)
+            try:
+                result = call(host)
+            except BaseException as e:
+                if not host_failure(e):
+                    self._end(host, generation=generation)
+                    raise
+                self._end(host, error=e, generation=generation)
+                print(f"Error: {host.url}: {str(e)}")
+                error = e
+                continue
+            self._end(host, session_id, generation=generation)
+            return result
+        raise NoHealthyHost(f"No Ollama host answered: {str(error)}") from error
+
+    def _stream(self, session_id, call):
+        error = None
+        for host in self._order(session_id, generation=True):
+            self._begin(host, generation=True)
+            try:
+                stream = call(host)
+                first = next(stream)
+            except StopIteration:
+                self._end(host, session_id, generation=True)
+                return
+            except BaseException as e:
+                if not host_failure(e):
+                    self._end(host, generation=True)
+                    raise
+                self._end(host, error=e, generation=True)
+                print(f"Error: {host.url}: {str(e)}")
+                error = e
+                continue
+            try:
+                yield first
+                yield from stream
+            finally:
+                self._end(host, session_id, generation=True)
+            return
+        raise NoHealthyHost(f"No Ollama host answered: {str(error)}") from error
+
+    # Client interface
+
+    def chat(self, *args, session_id=None, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(session_id, lambda host: host.client.chat(*args, **kwargs))
+        return self._call(session_id, lambda host: host.client.chat(*args, **kwargs), generation=True)
+
+    def embed(self, *args, session_id=None, **kwargs):
+        return self._call(session_id, lambda host: host.client.embed(*args, **kwargs))
+
+    def list(self):
+        return self._call(None, lambda host: host.client.list())
+
+    def preload(self, model, keep_alive=None):
+        """Load ``model`` into memory on every live host; return how many answered."""
+        now = self._clock()
+        loaded = 0
+        for host in self.hosts:
+            if host.ejected_until > now:
+                continue
+            try:
+                # A chat request without messages only loads the model
+                host.client.chat(model=model, messages=[], keep_alive=keep_alive)
+                loaded += 1
+            except Exception as e:
+                print(f"Error: {host.url}: {str(e)}")
+        return loaded
+
+    # Async interface for the ASGI app
+
+    def _async_client(self, host):
+        if host.async_client is None:
+            host.async_client = AsyncClient(host=host.url, **self._client_options)
+        return host.async_client
+
+    async def achat(self, *args, session_id=None, **kwargs):
+        """Async ``chat``; with stream=True, returns an async iterator of chunks."""
+        error = None
+        for host in self._order(session_id, generation=True):
+            self._begin(host, generation=True)
+            try:
+                result = await self._async_client(host).chat(*args, **kwargs)
+                if kwargs.get("stream"):
+                    first = await anext(result, None)
+            except BaseException as e:
+                if not host_failure(e):
+                    self._end(host, generation=True)
+                    raise
+                self._end(host, error=e, generation=True)
+                print(f"Error: {host.url}: {str(e)}")
+                error = e
+                continue
+            if not kwargs.get("stream"):
+                self._end(host, session_id, generation=True)
+                return result
+            return self._astream(host, session_id, first, result)
+        raise NoHealthyHost(f"No Ollama host answered: {str(error)}") from error
+
+    async def _astream(self, host, session_id, first, stream):
+        try:
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            self._end(host, session_id, generation=True)
+            await stream.aclose()
+
+    # Health
+
+    def check_health(self):
+        """Probe every host once; readmit the ones that answer and eject the rest."""
+        for host in self.hosts:
+            try:
+                host.client.list()
+            except Exception:
+                with self._lock:
+                    host.failures += 1
+                    host.ejected_until = self._clock() + self.eject_seconds
+                continue
+            with self._lock:
+                host.ejected_until = 0.0
+
+    def stats(self):
+        now = self._clock()
+        with self._lock:
+            stats = {"failovers": self.failovers, "sticky_sessions": len(self._sticky)}
+            for i, host in enumerate(self.hosts):
+                stats[f"host{i}_outstanding"] = host.outstanding
+                stats[f"host{i}_generating"] = host.generating
+                stats[f"host{i}_requests"] = host.requests
+                stats[f"host{i}_failures"] = host.failures
+                stats[f"host{i}_healthy"] = int(host.ejected_until <= now)
+            return stats
+
+
+class RoutedEmbeddings(Embeddings):
+    """LangChain embeddings that call Ollama's /api/embed through an OllamaRouter."""
+
+    def __init__(self, router, model):
+        self.router = router
+        self.model = model
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return list(self.router.embed(model=self.model, input=texts)["embeddings"])
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+__all__ = ['OllamaRouter', 'RoutedEmbeddings', 'NoHealthyHost', 'OLLAMA_ERRORS', 'host_failure']
@@ -1,9 +1,21 @@
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-from langchain.memory import ConversationBufferMemory
-from ollama import Client
-from utils.response_handler import make_empathic
+from utils import metrics
+from utils.components import ComponentPool
+from utils.conversation_store import SQLiteConversationStore
+from utils.history import HistoryWindow, estimate_tokens, format_message
+from utils.knowledge_versions import KnowledgeVersions
+from utils.memory_store import SessionMemoryStore
+from utils.ollama_router import OLLAMA_ERRORS
+from utils.response_cache import SemanticResponseCache
+from utils.response_handler import make_empathic, empathic_prefix
+from utils.scheduler import FairScheduler, QueueFull, QueueTimeout
+from contextlib import contextmanager
+import contextvars
+import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -11,33 +23,240 @@ sys.path.append(str(Path(__file__).parent.parent))
 MODEL = "mistral"
 TEMPERATURE = 0.7
 EMBEDDING_MODEL = "nomic-embed-text"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_HOSTS = os.environ.get("OLLAMA_HOSTS", OLLAMA_HOST).split(",")  # comma-separated
+OLLAMA_ROUTING = {
+    "health_interval": 10,  # seconds between background health checks
+    "eject_seconds": 30,  # how long a failed host is skipped
+    "max_connections": 32,  # pooled connections per host
+    "sticky_slack": 2,  # extra in-flight requests a session tolerates to stay on its host
+    "max_in_flight": 4,  # generations per host at once; match the host's OLLAMA_NUM_PARALLEL
+}
+SCHEDULER = {
+    "max_queue": 64,  # generations waiting beyond this get the fallback reply
+    "max_wait": 10,  # seconds before a waiting generation is served ahead of its priority class
+}  # set to None to let every request call Ollama straight away
+COLLECTION_NAME = "therapy_knowledge"
+PERSIST_DIRECTORY = os.environ.get("SOULSPACE_DATABASE", "database")
+KNOWLEDGE_VERSIONS = f"{PERSIST_DIRECTORY}/knowledge_versions.json"  # which collection version is live
+KNOWLEDGE_CHECK_INTERVAL = 5  # seconds between checks for a swapped version
+MEMORY_BACKEND = os.environ.get("SOULSPACE_MEMORY_BACKEND", "memory")  # or "sqlite" for the durable conversation store
+CONVERSATION_DB = f"{PERSIST_DIRECTORY}/conversations.sqlite3"
+MAX_SESSIONS = 5000
+SESSION_IDLE_TTL = 1800  # seconds
+MAX_TURNS_PER_SESSION = 50
+MEMORY_CAP_BYTES = 256 * 1024 * 1024
+EMBEDDING_CACHE = {
+    "path": f"{PERSIST_DIRECTORY}/embedding_cache.sqlite3",
+    "memory_items": 4096,
+    "disk_items": 100_000,
+}  # set to None to call the embedding model on every query
+EMBEDDING_BATCH = {
+    "window": 0.005,  # seconds to wait for more concurrent queries
+    "max_batch": 32,
+}  # set to None to send each query embedding on its own
+RETRIEVER = os.environ.get("SOULSPACE_RETRIEVER", "chroma")  # or "numpy" for the in-process memory-mapped index
+NUMPY_INDEX_DIRECTORY = f"{PERSIST_DIRECTORY}/numpy_index"
+# "float16" halves the file size, but without quantization each query widens every row to
+# float32: 5-6x slower (100k rows: ~200 ms vs 35 ms p50). With quantization only re-ranked rows are read
+NUMPY_INDEX_DTYPE = "float32"
+NUMPY_INDEX_QUANTIZATION = None  # "int8" (4x smaller) or "binary" (32x) codes scanned before exact re-ranking
+NUMPY_INDEX_RERANK = 10  # candidates re-ranked at full precision per document retrieved
+NUMPY_INDEX_CHECK_INTERVAL = 30  # seconds between checks that the export matches the collection; None never checks
+HYBRID_RETRIEVAL = {
+    "fast_path_coverage": 0.8,  # answer from BM25 alone when the top hit covers this much of the query
+    "rrf_k": 60,
+    "candidates": 10,  # results taken from each side before fusion
+}  # set to None to embed every query and use vector search only
+RETRIEVAL_K = 3  # knowledge documents put in the prompt at most
+RETRIEVAL_SCORE_THRESHOLD = None  # e.g. 0.5 leaves out documents less relevant than that (cosine similarity, or query coverage for lexical hits)
+RESPONSE_CACHE = None  # opt-in, e.g. {"threshold": 0.95, "ttl": 600, "max_items": 1000}
+RESPONSE_CACHE_MAX_HISTORY_TOKENS = 0  # only turns with at most this much history use the cache
+PROMPT_MODE = "single"  # or "messages" for a stable system prompt plus chat turns
+KEEP_ALIVE = "30m"  # how long Ollama keeps the model and its prompt cache loaded
+SYSTEM_PROMPT = """You are a warm, supportive therapist. For every client message:
+1. Acknowledge previous discussion
+2. Suggest 1-2 techniques, drawing on the therapeutic knowledge provided
+3. Ask one question"""
+LATENCY_BUDGET = None  # seconds before a degraded answer is sent instead, e.g. 8; None waits
+GENERATION_THREADS = 32  # threads reading model streams when LATENCY_BUDGET is set
+CONTEXT_THREADS = 16  # threads loading history while the request thread retrieves; set to None to do one after the other
+HISTORY_MODE = "buffer"  # "buffer" sends every turn, "budget" uses HistoryWindow
+HISTORY_RECENT_TURNS = 4
+HISTORY_TOKEN_BUDGET = 1024
 
-# Initialize memory
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True
+# Pointer to the live knowledge-base version (see utils/knowledge_versions.py)
+knowledge_versions = KnowledgeVersions(
+    KNOWLEDGE_VERSIONS, COLLECTION_NAME, check_interval=KNOWLEDGE_CHECK_INTERVAL)
+
+# Long-lived components shared by every request
+components = ComponentPool(
+    ollama_hosts=OLLAMA_HOSTS,
+    ollama_routing=OLLAMA_ROUTING,
+    embedding_model=EMBEDDING_MODEL,
+    collection_name=COLLECTION_NAME,
+    persist_directory=PERSIST_DIRECTORY,
+    embedding_cache=EMBEDDING_CACHE,
+    embedding_batch=EMBEDDING_BATCH,
+    retriever=RETRIEVER,
+    index_directory=NUMPY_INDEX_DIRECTORY,
+    index_dtype=NUMPY_INDEX_DTYPE,
+    index_quantization=NUMPY_INDEX_QUANTIZATION,
+    index_rerank=NUMPY_INDEX_RERANK,
+    index_check_interval=NUMPY_INDEX_CHECK_INTERVAL,
+    hybrid=HYBRID_RETRIEVAL,
+    versions=knowledge_versions
 )
 
-def get_response(user_input):
-    try:
-        # Initialize components
-        db = Chroma(
-            collection_name="therapy_knowledge",
-            embedding_function=OllamaEmbeddings(model=EMBEDDING_MODEL),
-            persist_directory="database"
+# Conversation memory, one bounded buffer per session or a durable SQLite log
+if MEMORY_BACKEND == "sqlite":
+    memory_store = SQLiteConversationStore(CONVERSATION_DB, max_turns=MAX_TURNS_PER_SESSION)
+else:
+    memory_store = SessionMemoryStore(
+        max_sessions=MAX_SESSIONS,
+        idle_ttl=SESSION_IDLE_TTL,
+        max_turns=MAX_TURNS_PER_SESSION,
+        max_bytes=MEMORY_CAP_BYTES
+    )
+
+def summarize(summary, lines):
+    transcript = "\n".join(lines)
+    prompt = f"""Summary so far:
+    {summary or "(none)"}
+    
+    New lines of conversation:
+    {transcript}
+    
+    Update the summary in at most five sentences. Keep the client's concerns,
+    feelings and any techniques already suggested. Reply with the summary only."""
+    
+    # Summaries share one background queue, behind every reply
+    with generation_slot("summaries", "background"):
+        response = components.client.chat(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            options={"temperature": 0}
         )
-        
-        # Retrieve context
-        results = db.similarity_search(user_input, k=3)
-        context = "\n".join(doc.page_content for doc in results)
-        
-        # Load conversation history
-        history = memory.load_memory_variables({})["chat_history"]
-        history_str = "\n".join(str(msg) for msg in history)
-        
-        # Generate response
-        client = Client(host='http://localhost:11434')
-        prompt = f"""Previous conversation:
+    return response['message']['content'].strip()
+
+def preload_model():
+    """Have Ollama load the chat model now rather than on the first reply."""
+    if not components.client.preload(MODEL, keep_alive=KEEP_ALIVE):
+        raise ConnectionError(f"No Ollama host loaded {MODEL}")
+
+# Gauges for the in-process stores and caches on /metrics
+def embedding_stats():
+    stats = {}
+    embeddings = components.peek("embeddings")
+    while embeddings is not None:
+        if hasattr(embeddings, "stats"):
+            prefix = type(embeddings).__name__.replace("Embeddings", "").lower()
+            stats.update({f"{prefix}_{key}": value for key, value in embeddings.stats().items()})
+        embeddings = getattr(embeddings, "inner", None)
+    return stats
+
+# Shared replies for near-identical opening messages
+response_cache = None
+if RESPONSE_CACHE is not None:
+    response_cache = SemanticResponseCache(
+        lambda text: components.embeddings.embed_query(text), **RESPONSE_CACHE)
+    metrics.registry.stats_gauges("soulspace_response_cache", response_cache.stats, "Semantic response cache")
+
+# Replies cached against the old knowledge version are dropped on a swap; query
+# embeddings do not depend on the version and stay cached
+def on_knowledge_swap(previous, live):
+    print(f"Knowledge base switched from {previous} to {live}")
+    metrics.knowledge_swaps.inc()
+    if response_cache is not None:
+        response_cache.clear()
+
+components.swap_listeners.append(on_knowledge_swap)
+
+metrics.registry.stats_gauges("soulspace_memory_store", memory_store.stats, "Session memory store")
+metrics.registry.stats_gauges("soulspace_embeddings", embedding_stats, "Embedding cache and batcher")
+metrics.registry.stats_gauges(
+    "soulspace_ollama", lambda: components.peek("client").stats(), "Ollama host routing")
+
+# Token-budgeted history with a background running summary
+history_window = HistoryWindow(
+    memory_store,
+    summarize,
+    recent_turns=HISTORY_RECENT_TURNS,
+    token_budget=HISTORY_TOKEN_BUDGET
+)
+
+FALLBACK_RESPONSE = "Let me think differently about that..."
+
+class BudgetExceeded(Exception):
+    pass
+
+# Model streams are read here when a latency budget applies, so waits can time out
+generation_pool = ThreadPoolExecutor(max_workers=GENERATION_THREADS, thread_name_prefix="generation")
+_DONE = object()
+
+# Conversation history is loaded here while the request thread retrieves knowledge
+context_pool = None
+if CONTEXT_THREADS is not None:
+    context_pool = ThreadPoolExecutor(max_workers=CONTEXT_THREADS, thread_name_prefix="context")
+
+# Fair admission to generation: first messages ahead of follow-ups, sessions take turns
+scheduler = None
+if SCHEDULER is not None:
+    scheduler = FairScheduler(lambda: components.client.capacity(), **SCHEDULER)
+    metrics.registry.stats_gauges("soulspace_scheduler", scheduler.stats, "Generation scheduler")
+
+def priority_for(history_str):
+    """A session's first message is scheduled ahead of follow-ups."""
+    return "followup" if history_str.strip() else "first"
+
+@contextmanager
+def generation_slot(session_id, priority, deadline=None):
+    """Hold a scheduler slot while generating; BudgetExceeded if none frees up by ``deadline``."""
+    if scheduler is None:
+        yield
+        return
+    timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+    with metrics.span("queue"):
+        try:
+            scheduler.acquire(session_id, priority, timeout)
+        except QueueTimeout:
+            metrics.budget_overruns.inc(stage="queue")
+            metrics.note("budget_overrun", "queue")
+            raise BudgetExceeded("queue") from None
+    try:
+        yield
+    finally:
+        scheduler.release()
+
+def retrieve_context(user_input):
+    components.sync()
+    # An unreachable embedding host is no reason to rebuild the retriever
+    with metrics.span("retrieval"), components.using("retriever", "vectorstore", ignore=OLLAMA_ERRORS):
+        if RETRIEVAL_SCORE_THRESHOLD is None:
+            results = components.retriever.similarity_search(user_input, k=RETRIEVAL_K)
+        else:
+            # Filtered here: LangChain's own score_threshold logs a warning whenever nothing passes
+            scored = components.retriever.similarity_search_with_relevance_scores(user_input, k=RETRIEVAL_K)
+            results = [doc for doc, score in scored if score >= RETRIEVAL_SCORE_THRESHOLD]
+    metrics.retrieved_documents.observe(len(results))
+    metrics.note("documents", len(results))
+    return "\n".join(doc.page_content for doc in results)
+
+def load_history(session_id):
+    with metrics.span("history"):
+        if HISTORY_MODE == "budget":
+            history_str = history_window.render(session_id)
+            count = len(history_str.splitlines())
+        else:
+            history = memory_store.history(session_id)
+            history_str = "\n".join(str(msg) for msg in history)
+            count = len(history)
+    metrics.history_messages.observe(count)
+    metrics.note("history_messages", count)
+    return history_str
+
+def build_prompt(history_str, context, user_input):
+    prompt = f"""Previous conversation:
         {history_str}
         
         Therapeutic knowledge:
@@ -49,24 +268,292 @@ def get_response(user_input):
         1. Acknowledge previous discussion
         2. 1-2 techniques
         3. One question"""
-        
-        response = client.chat(
+    tokens = estimate_tokens(prompt)
+    metrics.prompt_tokens.observe(tokens)
+    metrics.note("prompt_tokens", tokens)
+    return prompt
+
+CHAT_ROLES = {"human": "user", "ai": "assistant"}
+
+def load_history_messages(session_id):
+    """Return the running summary (budget mode only) and the earlier messages."""
+    with metrics.span("history"):
+        if HISTORY_MODE == "budget":
+            summary, history = history_window.window(session_id)
+        else:
+            summary, history = "", memory_store.history(session_id)
+    metrics.history_messages.observe(len(history))
+    metrics.note("history_messages", len(history))
+    return summary, history
+
+def build_messages(summary, history, context, user_input):
+    """Chat messages whose prefix only grows from one turn to the next.
+    
+    The system prompt and earlier turns come first, unchanged, so Ollama can
+    reuse its cached prefix; retrieved context goes in the final turn only.
+    """
+    system = SYSTEM_PROMPT
+    if summary:
+        system += f"\n\nSummary of earlier conversation: {summary}"
+    messages = [{"role": "system", "content": system}]
+    messages += [{"role": CHAT_ROLES.get(msg.type, "user"), "content": msg.content} for msg in history]
+    messages.append({"role": "user", "content": f"Therapeutic knowledge:\n{context}\n\nClient: {user_input}"})
+    tokens = sum(estimate_tokens(message["content"]) for message in messages)
+    metrics.prompt_tokens.observe(tokens)
+    metrics.note("prompt_tokens", tokens)
+    return messages
+
+def load_conversation(session_id):
+    """The history PROMPT_MODE needs: the summary and messages, or the history text."""
+    if PROMPT_MODE == "messages":
+        return load_history_messages(session_id)
+    return load_history(session_id)
+
+def assemble_messages(conversation, context, user_input):
+    """Return the chat messages for PROMPT_MODE and the history text they carry."""
+    if PROMPT_MODE == "messages":
+        summary, history = conversation
+        lines = [format_message(msg) for msg in history]
+        if summary:
+            lines.insert(0, summary)
+        return build_messages(summary, history, context, user_input), "\n".join(lines)
+    return [{"role": "user", "content": build_prompt(conversation, context, user_input)}], conversation
+
+def prepare(user_input, session_id):
+    """Retrieve knowledge and load the conversation at the same time.
+    
+    History loads on context_pool while this thread retrieves. If no pool
+    thread has started on it by the time retrieval is done, it is loaded
+    here instead, so a busy pool never makes a request slower than doing
+    the two in turn. Returns the context, the chat messages and the
+    history text.
+    """
+    with metrics.span("prepare"):
+        if context_pool is None:
+            context = retrieve_context(user_input)
+            conversation = load_conversation(session_id)
+        else:
+            pending = context_pool.submit(contextvars.copy_context().run, load_conversation, session_id)
+            try:
+                context = retrieve_context(user_input)
+            except BaseException:
+                pending.cancel()
+                raise
+            conversation = load_conversation(session_id) if pending.cancel() else pending.result()
+        return (context, *assemble_messages(conversation, context, user_input))
+
+def record_generation(response, ttft=None):
+    """Report the prompt tokens Ollama had to evaluate and the time to first token."""
+    count = response.get('prompt_eval_count') or 0
+    if ttft is None:
+        # Not streamed: the server's load and prompt-eval time is what precedes the first token
+        ttft = ((response.get('load_duration') or 0) + (response.get('prompt_eval_duration') or 0)) / 1e9
+    metrics.prompt_eval_tokens.observe(count, mode=PROMPT_MODE)
+    metrics.time_to_first_token.observe(ttft, mode=PROMPT_MODE)
+    metrics.note("prompt_eval_count", count)
+    metrics.note("ttft_ms", round(ttft * 1000, 3))
+
+def stream_tokens(messages, session_id, priority="followup", deadline=None):
+    """Yield the reply tokens of one streamed chat call and record its timings."""
+    with generation_slot(session_id, priority, deadline):
+        started = time.perf_counter()
+        ttft = None
+        stream = components.client.chat(
             model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            options={"temperature": TEMPERATURE}
+            messages=messages,
+            options={"temperature": TEMPERATURE},
+            keep_alive=KEEP_ALIVE,
+            stream=True,
+            session_id=session_id
         )
+        for chunk in stream:
+            token = chunk['message']['content']
+            if token:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                yield token
+            if chunk.get('done'):
+                record_generation(chunk, ttft)
+
+def within_budget(tokens, first_token_by, finish_by=None):
+    """Re-yield ``tokens`` read on a generation thread, raising BudgetExceeded
+    when the first token is not in by ``first_token_by`` or the last by
+    ``finish_by`` (perf_counter times; None means no limit).
+    
+    On timeout the token stream is closed when its next chunk arrives, which
+    drops the connection so Ollama stops generating.
+    """
+    chunks = queue.Queue()
+    cancelled = threading.Event()
+    
+    def pump():
+        try:
+            if cancelled.is_set():
+                return
+            for token in tokens:
+                if cancelled.is_set():
+                    break
+                chunks.put(token)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            tokens.close()
+            chunks.put(_DONE)
+    
+    generation_pool.submit(contextvars.copy_context().run, pump)
+    started = False
+    try:
+        while True:
+            deadline = finish_by if started else first_token_by
+            if deadline is not None and finish_by is not None:
+                deadline = min(deadline, finish_by)
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                item = chunks.get(timeout=timeout)
+            except queue.Empty:
+                stage = "generation" if started else "first_token"
+                metrics.budget_overruns.inc(stage=stage)
+                metrics.note("budget_overrun", stage)
+                raise BudgetExceeded(stage) from None
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            started = True
+            yield item
+    finally:
+        cancelled.set()
+
+def degraded_answer(context):
+    """Fast reply built from the retrieved techniques, for when the model is too slow."""
+    metrics.fallback_responses.inc(reason="deadline")
+    metrics.note("fallback", "deadline")
+    techniques = [line.strip() for line in context.splitlines() if line.strip()][:2]
+    if not techniques:
+        return FALLBACK_RESPONSE
+    listed = "\n".join(f"- {technique}" for technique in techniques)
+    return (f"Here are a couple of techniques that may help right now:\n{listed}\n"
+            "Would you like to try one of them together?")
+
+def cacheable(history_str):
+    return response_cache is not None and estimate_tokens(history_str) <= RESPONSE_CACHE_MAX_HISTORY_TOKENS
+
+def save_turn(session_id, user_input, output):
+    with metrics.span("save"):
+        if HISTORY_MODE == "budget":
+            history_window.record(session_id, user_input, output)
+        else:
+            memory_store.save(session_id, user_input, output)
+
+def fallback(reason):
+    metrics.fallback_responses.inc(reason=reason)
+    metrics.note("fallback", reason)
+    return FALLBACK_RESPONSE
+
+def get_response(user_input, session_id="default"):
+    with metrics.traced("chat"):
+        return _get_response(user_input, session_id)
+
+def _get_response(user_input, session_id):
+    deadline = None if LATENCY_BUDGET is None else time.perf_counter() + LATENCY_BUDGET
+    context = ""
+    try:
+        # Retrieve context and load conversation history
+        context, messages, history_str = prepare(user_input, session_id)
+        priority = priority_for(history_str)
+        
+        # Generate response
+        def generate():
+            if deadline is not None:
+                tokens = stream_tokens(messages, session_id, priority, deadline)
+                with metrics.span("generation"):
+                    return "".join(within_budget(tokens, deadline, deadline))
+            with generation_slot(session_id, priority), metrics.span("generation"):
+                response = components.client.chat(
+                    model=MODEL,
+                    messages=messages,
+                    options={"temperature": TEMPERATURE},
+                    keep_alive=KEEP_ALIVE,
+                    session_id=session_id
+                )
+            record_generation(response)
+            return response['message']['content']
+        
+        if cacheable(history_str):
+            with metrics.span("response_cache"):
+                output = response_cache.get_or_generate(user_input, context, generate)
+        else:
+            output = generate()
         
         # Save to memory
-        memory.save_context(
-            {"input": user_input},
-            {"output": response['message']['content']}
-        )
+        save_turn(session_id, user_input, output)
+        
+        # A fresh empathic prefix per reply, so cached replies still vary
+        with metrics.span("empathy"):
+            return make_empathic(output)
+        
+    except BudgetExceeded:
+        answer = degraded_answer(context)
+        save_turn(session_id, user_input, answer)
+        return make_empathic(answer)
+        
+    except QueueFull:
+        return make_empathic(fallback("busy"))
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return make_empathic(fallback("error"))
+
+def stream_response(user_input, session_id="default"):
+    """Yield the reply in pieces: the empathic prefix first, then model tokens."""
+    with metrics.traced("stream"):
+        yield from _stream_response(user_input, session_id)
+
+def _stream_response(user_input, session_id):
+    deadline = None if LATENCY_BUDGET is None else time.perf_counter() + LATENCY_BUDGET
+    yield empathic_prefix()
+    
+    parts = []
+    context = ""
+    try:
+        context, messages, history_str = prepare(user_input, session_id)
+        
+        # A cached reply is sent whole; streamed misses are not coalesced
+        cache = cacheable(history_str)
+        if cache:
+            with metrics.span("response_cache"):
+                cached = response_cache.lookup(user_input, context)
+            if cached is not None:
+                parts.append(cached)
+                yield cached
+                save_turn(session_id, user_input, cached)
+                return
         
-        return make_empathic(response['message']['content'])
+        # Under a budget only the first token has a deadline; a started reply runs on
+        tokens = stream_tokens(messages, session_id, priority_for(history_str), deadline)
+        if deadline is not None:
+            tokens = within_budget(tokens, deadline)
+        with metrics.span("generation"):
+            for token in tokens:
+                parts.append(token)
+                yield token
+        
+        save_turn(session_id, user_input, "".join(parts))
+        if cache:
+            response_cache.put(user_input, context, "".join(parts))
+        
+    except BudgetExceeded:
+        answer = degraded_answer(context)
+        save_turn(session_id, user_input, answer)
+        yield answer
+        
+    except QueueFull:
+        yield fallback("busy")
         
     except Exception as e:
         print(f"Error: {str(e)}")
-        return make_empathic("Let me think differently about that...")
+        if not parts:
+            yield fallback("error")
 
 if __name__ == "__main__":
     print("Testing RAG system with memory...")
@@ -75,4 +562,3 @@ if __name__ == "__main__":
         if query.lower() in ["quit", "exit"]:
             break
         print("Therapist:", get_response(query))
-
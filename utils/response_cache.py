@@ -0,0 +1,160 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("vector", "context_key", "reply", "expires")
+
+    def __init__(self, vector, context_key, reply, expires):
+        self.vector = vector
+        self.context_key = context_key
+        self.reply = reply
+        self.expires = expires
+
+
+class SemanticResponseCache:
+    """Reuses model replies for near-identical questions over the same context.
+
+    A reply matches when the retrieved context hashes the same and the
+    cosine similarity of the query embeddings is at least ``threshold``.
+    Entries live for ``ttl`` seconds, and the least recently used are
+    evicted beyond ``max_items``. While a reply is being generated, matching
+    requests wait for it instead of starting their own generation.
+    """
+
+    def __init__(self, embed, threshold=0.95, ttl=600, max_items=1000, clock=time.monotonic):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_items = max_items
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry id -> _Entry, least recently used first
+        self._by_context = {}  # context hash -> set of entry ids
+        self._inflight = {}  # context hash -> list of (vector, Future)
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def context_key(context):
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+    def vector(self, query):
+        vector = np.asarray(self.embed(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_context[entry.context_key]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_context[entry.context_key]
+
+    def _find(self, vector, context_key, now):
+        best_id, best = None, self.threshold
+        for entry_id in list(self._by_context.get(context_key, ())):
+            entry = self._entries[entry_id]
+            if entry.expires <= now:
+                self._drop(entry_id)
+                continue
+            similarity = float(np.dot(entry.vector, vector))
+            if similarity >= best:
+                best_id, best = entry_id, similarity
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id].reply
+
+    def lookup(self, query, context):
+        """Return a cached reply for this query and context, or None."""
+        vector = self.vector(query)
+        with self._lock:
+            reply = self._find(vector, self.context_key(context), self._clock())
+            if reply is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return reply
+
+    def put(self, query, context, reply, vector=None):
+        if vector is None:
+            vector = self.vector(query)
+        with self._lock:
+            self._store(vector, self.context_key(context), reply)
+
+    def _store(self, vector, context_key, reply):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(vector, context_key, reply, self._clock() + self.ttl)
+        self._by_context.setdefault(context_key, set()).add(entry_id)
+        while len(self._entries) > self.max_items:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get_or_generate(self, query, context, generate):
+        """Return a cached reply, wait on a matching generation, or run ``generate``."""
+        vector = self.vector(query)
+        context_key = self.context_key(context)
+        with self._lock:
+            reply = self._find(vector, context_key, self._clock())
+            if reply is not None:
+                self.hits += 1
+                return reply
+            for other, future in self._inflight.get(context_key, ()):
+                if float(np.dot(other, vector)) >= self.threshold:
+                    self.coalesced += 1
+                    break
+            else:
+                future = None
+                self.misses += 1
+                owned = (vector, Future())
+                self._inflight.setdefault(context_key, []).append(owned)
+
+        if future is not None:
+            return future.result()
+
+        try:
+            reply = generate()
+        except BaseException as e:
+            owned[1].set_exception(e)
+            raise
+        else:
+            owned[1].set_result(reply)
+            with self._lock:
+                self._store(vector, context_key, reply)
+            return reply
+        finally:
+            with self._lock:
+                waiting = self._inflight[context_key]
+                waiting.remove(owned)
+                if not waiting:
+                    del self._inflight[context_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+__all__ = ['SemanticResponseCache']
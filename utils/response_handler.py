@@ -1,5 +1,5 @@
-def make_empathic(response):
-    """More natural empathy rotation"""
+def empathic_prefix():
+    """Opening phrase that make_empathic puts in front of a reply"""
     empathic_phrases = [
         "I hear how difficult this feels",
         "That sounds really challenging",
@@ -9,7 +9,11 @@ def make_empathic(response):
     ]
     
     from random import choice
-    return f"{choice(empathic_phrases)}. {response}"
+    return f"{choice(empathic_phrases)}. "
+
+def make_empathic(response):
+    """More natural empathy rotation"""
+    return f"{empathic_prefix()}{response}"
 
 #makes the function natural 
-__all__ = ['make_empathic']
\ No newline at end of file
+__all__ = ['make_empathic', 'empathic_prefix']
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from utils import metrics
+
+
+class QueueFull(Exception):
+    pass
+
+
+class QueueTimeout(TimeoutError):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("session_id", "priority", "enqueued", "state", "event", "loop", "future")
+
+    def __init__(self, session_id, priority, enqueued, loop=None):
+        self.session_id = session_id
+        self.priority = priority
+        self.enqueued = enqueued
+        self.state = "waiting"  # then "granted" or "cancelled"
+        # Threads wait on an event, coroutines on a future of their loop
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+            self.future = None
+        else:
+            self.event = None
+            self.future = loop.create_future()
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    """Admission control for LLM generation with per-session fair queuing.
+
+    At most ``capacity`` generations run at once; ``capacity`` is a number or
+    a function, such as ``OllamaRouter.capacity``, that is asked again on
+    every admission. Waiting requests are grouped by priority class, earlier
+    in ``priorities`` first, and within a class by session. Sessions take
+    turns one request at a time, so a session with many requests queued
+    waits behind the next request of every other session. A request that
+    has waited ``max_wait`` seconds is admitted ahead of its class, so lower
+    classes are never starved. With ``max_queue`` requests waiting, further
+    ones are refused with QueueFull.
+    """
+
+    def __init__(self, capacity, priorities=("first", "followup", "background"), max_queue=256,
+                 max_wait=10, poll_interval=0.5, clock=time.monotonic):
+        self.capacity = capacity
+        self.priorities = tuple(priorities)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # Waiters re-check this often, so capacity freed by a readmitted host is used
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._queues = {priority: OrderedDict() for priority in self.priorities}  # session -> waiters
+        self._arrivals = deque()  # every waiter in arrival order, for max_wait
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.aged = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _limit(self):
+        limit = self.capacity() if callable(self.capacity) else self.capacity
+        return float("inf") if limit is None else limit
+
+    def full(self):
+        return self.queued >= self.max_queue and self.in_flight >= self._limit()
+
+    def _enqueue(self, session_id, priority, loop=None):
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class {priority}")
+        waiter = _Waiter(session_id, priority, self._clock(), loop)
+        with self._lock:
+            # Nobody waiting and a slot free: no need to queue
+            if not self.queued and self.in_flight < self._limit():
+                self._grant(waiter)
+                return waiter
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull()
+            self._queues[priority].setdefault(session_id, deque()).append(waiter)
+            self._arrivals.append(waiter)
+            self.queued += 1
+        return waiter
+
+    def _grant(self, waiter):
+        # Called with the lock held
+        waiter.state = "granted"
+        self.in_flight += 1
+        self.admitted += 1
+        metrics.queue_wait_seconds.observe(self._clock() - waiter.enqueued, priority=waiter.priority)
+
+    def _next(self):
+        # Called with the lock held; the longest waiter first once it is overdue
+        while self._arrivals and self._arrivals[0].state != "waiting":
+            self._arrivals.popleft()
+        if self._arrivals and self._clock() - self._arrivals[0].enqueued >= self.max_wait:
+            waiter = self._arrivals.popleft()
+            self._unqueue(waiter)
+            self.aged += 1
+            return waiter
+        for queue in self._queues.values():
+            if queue:
+                # Round robin: the session at the front sends one request, then goes to the back
+                session_id, waiters = next(iter(queue.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    queue.move_to_end(session_id)
+                else:
+                    del queue[session_id]
+                return waiter
+        return None
+
+    def _unqueue(self, waiter):
+        queue = self._queues[waiter.priority]
+        waiters = queue[waiter.session_id]
+        waiters.remove(waiter)
+        if not waiters:
+            del queue[waiter.session_id]
+
+    def _dispatch(self):
+        woken = []
+        with self._lock:
+            while self.queued and self.in_flight < self._limit():
+                waiter = self._next()
+                self.queued -= 1
+                self._grant(waiter)
+                woken.append(waiter)
+        for waiter in woken:
+            waiter.wake()
+
+    def _cancel(self, waiter):
+        with self._lock:
+            if waiter.state == "waiting":
+                waiter.state = "cancelled"
+                self._unqueue(waiter)
+                self.queued -= 1
+                return
+        # Admitted just as the caller gave up: hand the slot on
+        if waiter.state == "granted":
+            self.release()
+
+    def acquire(self, session_id, priority="followup", timeout=None):
+        """Block until a generation may start; pair with ``release``."""
+        waiter = self._enqueue(session_id, priority)
+        if waiter.state == "granted":
+            return
+        deadline = None if timeout is None else self._clock() + timeout
+        try:
+            while waiter.state != "granted":
+                wait = self.poll_interval
+                if deadline is not None:
+                    wait = min(wait, deadline - self._clock())
+                    if wait <= 0:
+                        with self._lock:
+                            self.timeouts += 1
+                        raise QueueTimeout(f"No generation slot within {timeout}s")
+                waiter.event.wait(wait)
+                self._dispatch()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    async def acquire_async(self, session_id, priority="followup"):
+        """``acquire`` for the event loop; cancel the task to give up waiting."""
+        waiter = self._enqueue(session_id, priority, asyncio.get_running_loop())
+        if waiter.state == "granted":
+            return
+        try:
+            while waiter.state != "granted":
+                await asyncio.wait([waiter.future], timeout=self.poll_interval)
+                self._dispatch()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._dispatch()
+
+    @contextmanager
+    def slot(self, session_id, priority="followup", timeout=None):
+        self.acquire(session_id, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, session_id, priority="followup"):
+        await self.acquire_async(session_id, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            stats = {f"queued_{priority}": sum(len(waiters) for waiters in queue.values())
+                     for priority, queue in self._queues.items()}
+            stats.update({
+                "queued": self.queued,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "aged": self.aged,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            })
+        limit = self._limit()
+        if limit != float("inf"):
+            stats["capacity"] = limit
+        return stats
+
+
+__all__ = ['FairScheduler', 'QueueFull', 'QueueTimeout']
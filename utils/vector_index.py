@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.ingest import content_hash
+
+BLOCK_ROWS = 65536
+CODE_BLOCK_ROWS = 256  # int8 codes and float16 rows are widened to float32 in blocks small enough to stay in cache
+# Files of an export written before they were named per export
+LEGACY_FILES = {"embeddings": "embeddings.bin", "codes": "codes.bin", "documents": "documents.json"}
+# Bits set in each byte value, for NumPy versions without bitwise_count
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT[values.view(np.uint8)]
+
+
+def fingerprint(ids, documents, metadatas):
+    """Digest of every chunk's id and content; changes when any chunk is added, removed or rewritten."""
+    digest = hashlib.sha256()
+    chunks = sorted(zip(ids, documents, metadatas), key=lambda chunk: chunk[0])
+    for chunk_id, text, metadata in chunks:
+        digest.update(f"{chunk_id}\0{(metadata or {}).get('content_hash') or content_hash(text or '')}\n".encode())
+    return digest.hexdigest()
+
+
+def collection_fingerprint(collection):
+    """``fingerprint`` of a Chroma collection as it is now."""
+    data = collection.get(include=["documents", "metadatas"])
+    return fingerprint(data["ids"], data["documents"], data["metadatas"])
+
+
+def _top(scores, k):
+    """Column indices and scores of the k highest scores in each row, best first."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class NumpyIndex:
+    """Read-only cosine-similarity index over a memory-mapped embedding matrix.
+
+    ``export`` copies a Chroma collection's embeddings into one contiguous,
+    row-normalized float32 or float16 file plus a JSON sidecar with ids,
+    documents and metadata. ``similarity_search`` and
+    ``similarity_search_with_relevance_scores`` have the same shape as
+    Chroma's, so the index can stand in for the vector store in get_response.
+
+    With ``quantization`` the export also holds compact codes for every
+    row: "int8" scales each dimension to one byte (a quarter of float32),
+    "binary" keeps one sign bit per dimension around the corpus mean (a
+    32nd). A search scans only the codes, takes the ``rerank`` times k best
+    candidates and re-scores those rows exactly from the full-precision
+    file, which is read only for the candidates and can stay on disk.
+    """
+
+    def __init__(self, directory, embedding_function=None, rerank=10):
+        self.directory = Path(directory)
+        self.embedding_function = embedding_function
+        # Candidates re-scored at full precision per result wanted
+        self.rerank = rerank
+        meta = json.loads((self.directory / "meta.json").read_text())
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.quantization = meta.get("quantization")
+        # Exports written before fingerprints never match, so they are redone
+        self.fingerprint = meta.get("fingerprint")
+        self.files = meta.get("files", LEGACY_FILES)
+        if self.count:
+            self.matrix = np.memmap(self.directory / self.files["embeddings"], dtype=self.dtype,
+                                    mode="r", shape=(self.count, self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=self.dtype)
+        if self.quantization == "int8":
+            self.offset = np.asarray(meta["offset"], dtype=np.float32)
+            self.step = np.asarray(meta["step"], dtype=np.float32)
+            self.codes = self._open_codes(np.int8, self.dim)
+        elif self.quantization == "binary":
+            self.center = np.asarray(meta["center"], dtype=np.float32)
+            self.codes = self._open_codes(np.uint64, -(-self.dim // 64))
+        documents = json.loads((self.directory / self.files["documents"]).read_text())
+        self.ids = documents["ids"]
+        self.documents = documents["documents"]
+        self.metadatas = documents["metadatas"]
+
+    def _open_codes(self, dtype, width):
+        if not self.count:
+            return np.zeros((0, width), dtype=dtype)
+        return np.memmap(self.directory / self.files["codes"], dtype=dtype, mode="r", shape=(self.count, width))
+
+    @classmethod
+    def export(cls, collection, directory, dtype="float32", quantization=None):
+        """Write ``collection`` to ``directory`` and return the loaded index."""
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        if data["ids"]:
+            vectors = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        return cls.write(directory, data["ids"], vectors, data["documents"], data["metadatas"],
+                         dtype, quantization)
+
+    @classmethod
+    def write(cls, directory, ids, vectors, documents, metadatas, dtype="float32", quantization=None):
+        """Write an index of ``vectors`` (one row per id) and return it loaded.
+
+        Every export writes its own files and then swaps meta.json in, so
+        processes still memory-mapping the previous export keep reading it
+        intact. Files of exports older than that are removed.
+        """
+        if quantization not in (None, "int8", "binary"):
+            raise ValueError(f"Unknown quantization {quantization}")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        token = uuid.uuid4().hex[:12]
+        files = {"embeddings": f"embeddings-{token}.bin", "codes": f"codes-{token}.bin",
+                 "documents": f"documents-{token}.json"}
+        vectors = np.array(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        if len(vectors):
+            matrix = np.memmap(directory / files["embeddings"], dtype=dtype, mode="w+",
+                               shape=vectors.shape)
+            matrix[:] = vectors
+            matrix.flush()
+            del matrix
+        meta = {
+            "count": len(vectors),
+            "dim": vectors.shape[1] if len(vectors) else 0,
+            "dtype": np.dtype(dtype).name,
+            "fingerprint": fingerprint(ids, documents, metadatas),
+            "files": files,
+        }
+        if quantization is not None and len(vectors):
+            meta.update(cls._write_codes(directory / files["codes"], vectors, quantization))
+            meta["quantization"] = quantization
+        (directory / files["documents"]).write_text(json.dumps({
+            "ids": list(ids),
+            "documents": list(documents),
+            "metadatas": list(metadatas),
+        }))
+        previous = cls._files(directory)
+        # Replaced last: meta.json only ever names complete files
+        temporary = directory / f"meta-{token}.tmp"
+        temporary.write_text(json.dumps(meta))
+        os.replace(temporary, directory / "meta.json")
+        keep = set(files.values()) | set(previous.values())
+        for path in directory.iterdir():
+            stale = path.name not in keep and path.name.startswith(("embeddings", "codes", "documents"))
+            if stale and path.is_file():
+                path.unlink(missing_ok=True)
+        return cls(directory)
+
+    @staticmethod
+    def _files(directory):
+        try:
+            return json.loads((Path(directory) / "meta.json").read_text()).get("files", LEGACY_FILES)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _write_codes(path, vectors, quantization):
+        """Write the codes for ``vectors`` to ``path``; returns what decoding needs."""
+        if quantization == "int8":
+            # Each dimension's range spread over the 256 codes
+            low = vectors.min(axis=0)
+            step = (vectors.max(axis=0) - low) / 255
+            step[step == 0] = 1
+            params = {"offset": low.tolist(), "step": step.tolist()}
+            codes = np.memmap(path, dtype=np.int8, mode="w+", shape=vectors.shape)
+            for start in range(0, len(vectors), BLOCK_ROWS):
+                block = (vectors[start:start + BLOCK_ROWS] - low) / step - 128
+                codes[start:start + BLOCK_ROWS] = np.clip(np.rint(block), -128, 127)
+        else:
+            # Signs around the mean; embeddings share a common direction that would
+            # otherwise set most bits the same way for every row
+            center = vectors.mean(axis=0)
+            params = {"center": center.tolist()}
+            width = -(-vectors.shape[1] // 64)
+            codes = np.memmap(path, dtype=np.uint64, mode="w+", shape=(len(vectors), width))
+            for start in range(0, len(vectors), BLOCK_ROWS):
+                codes[start:start + BLOCK_ROWS] = NumpyIndex._pack(vectors[start:start + BLOCK_ROWS], center)
+        codes.flush()
+        return params
+
+    @staticmethod
+    def _pack(vectors, center):
+        bits = np.packbits(vectors > center, axis=1)
+        # Pad each row to whole 64-bit words, so XOR and popcount run on uint64
+        padded = np.zeros((len(bits), -(-bits.shape[1] // 8) * 8), dtype=np.uint8)
+        padded[:, :bits.shape[1]] = bits
+        return padded.view(np.uint64)
+
+    def _approximate_scores(self, queries):
+        """Scores from the codes alone; only their order within a query is meaningful."""
+        if self.quantization == "int8":
+            # q . (offset + (code + 128) * step) ranks rows like (q * step) . code
+            scaled = queries * self.step
+            return np.concatenate([
+                scaled @ self.codes[start:start + CODE_BLOCK_ROWS].astype(np.float32).T
+                for start in range(0, self.count, CODE_BLOCK_ROWS)
+            ], axis=1)
+        packed = self._pack(queries, self.center)
+        # Fewer differing bits is closer
+        return -np.stack([
+            _popcount(self.codes ^ query).sum(axis=1, dtype=np.int32) for query in packed
+        ]).astype(np.float32)
+
+    def _rerank(self, queries, candidates, k):
+        # Exact scores for each query's candidate rows only
+        rows = np.asarray(self.matrix[candidates.ravel()], dtype=np.float32)
+        rows = rows.reshape(candidates.shape + (self.dim,))
+        scores = np.einsum("qcd,qd->qc", rows, queries)
+        top, top_scores = _top(scores, k)
+        return np.take_along_axis(candidates, top, axis=1), top_scores
+
+    def _scores(self, queries):
+        if self.dtype == np.float32:
+            return queries @ self.matrix.T
+        # float16 has no fast matmul, so every query widens every row: several
+        # times slower than float32 even in cache-sized blocks
+        return np.concatenate([
+            queries @ self.matrix[start:start + CODE_BLOCK_ROWS].astype(np.float32).T
+            for start in range(0, self.count, CODE_BLOCK_ROWS)
+        ], axis=1)
+
+    def search_batch(self, vectors, k=3):
+        """Return ``(indices, scores)`` arrays of shape (len(vectors), k), best first."""
+        k = min(k, self.count)
+        if k == 0:
+            # Nothing to find, and an empty export has no dimension to shape the queries by
+            empty = np.zeros((len(vectors), 0))
+            return empty.astype(np.int64), empty
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        candidates = min(k * self.rerank, self.count)
+        if self.quantization is not None and candidates < self.count:
+            top, _ = _top(self._approximate_scores(queries), candidates)
+            return self._rerank(queries, top, k)
+        return _top(self._scores(queries), k)
+
+    def search(self, vector, k=3):
+        indices, scores = self.search_batch([vector], k)
+        return list(zip(indices[0].tolist(), scores[0].tolist()))
+
+    def document(self, index):
+        return Document(page_content=self.documents[index],
+                        metadata=self.metadatas[index] or {}, id=self.ids[index])
+
+    def similarity_search_by_vector(self, embedding, k=3):
+        return [self.document(i) for i, _ in self.search(embedding, k)]
+
+    def similarity_search(self, query, k=3):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+    def similarity_search_with_relevance_scores(self, query, k=3, score_threshold=None):
+        """``(Document, cosine similarity)`` pairs, best first, leaving out those below ``score_threshold``."""
+        hits = self.search(self.embedding_function.embed_query(query), k)
+        return [(self.document(i), score) for i, score in hits
+                if score_threshold is None or score >= score_threshold]
+
+    def similarity_search_batch(self, queries, k=3):
+        indices, _ = self.search_batch(self.embedding_function.embed_documents(queries), k)
+        return [[self.document(i) for i in row] for row in indices.tolist()]
+
+
+__all__ = ['NumpyIndex', 'fingerprint', 'collection_fingerprint']